@@ -1,14 +1,27 @@
 import dotenv from 'dotenv';
+import { createLogger } from '../utils/logger.js';
 
 // Load environment variables
 dotenv.config();
 
+const log = createLogger('config');
+
 class Settings {
     constructor() {
         // Server settings
         this.host = process.env.HOST || '0.0.0.0';
         this.port = parseInt(process.env.PORT || '8000', 10);
         this.debug = process.env.DEBUG === 'true' || process.env.NODE_ENV !== 'production';
+        // Load the AI services and open provider connections right after startup
+        this.warmUpOnStart = process.env.WARM_UP_ON_START === 'true';
+
+        // Browser origins allowed by CORS (comma-separated; '*' allows any).
+        // Must be set explicitly in production (checked in validate()).
+        this.corsOriginsConfigured = Boolean(process.env.CORS_ORIGINS);
+        this.corsOrigins = (process.env.CORS_ORIGINS || 'http://localhost:5173')
+            .split(',')
+            .map(origin => origin.trim())
+            .filter(Boolean);
         
         // API Keys
         this.openaiApiKey = process.env.OPENAI_API_KEY || '';
@@ -19,21 +32,52 @@ class Settings {
         // Supabase
         this.supabaseUrl = process.env.SUPABASE_URL || '';
         this.supabaseKey = process.env.SUPABASE_KEY || '';
+
+        // Use temperature 0 so repeated prompts produce the same (cacheable) output
+        this.deterministicGeneration = process.env.DETERMINISTIC_GENERATION === 'true';
+
+        // Optional requests-per-minute caps per AI provider (0 = unlimited)
+        this.providerRpm = {
+            openai: parseInt(process.env.OPENAI_RPM || '0', 10),
+            gemini: parseInt(process.env.GEMINI_RPM || '0', 10),
+            groq: parseInt(process.env.GROQ_RPM || '0', 10)
+        };
+
+        // Minutes to wait on an OpenAI batch before generating its posts directly
+        this.batchFallbackMinutes = parseInt(process.env.BATCH_FALLBACK_MINUTES || '60', 10);
+
+        // Race AI providers (staggered by HEDGE_DELAY_MS) instead of sequential fallback
+        this.hedgeProviders = process.env.HEDGE_PROVIDERS === 'true';
+        this.hedgeDelayMs = parseInt(process.env.HEDGE_DELAY_MS || '800', 10);
+
+        // Semantic response cache, opt-in (requires OpenAI for embeddings;
+        // adds one embeddings call per generation)
+        this.semanticCacheEnabled = process.env.SEMANTIC_CACHE === 'true';
+        this.semanticCacheThreshold = parseFloat(process.env.SEMANTIC_CACHE_THRESHOLD || '0.92');
+
+        // Shared keep-alive connection pool for provider SDK calls
+        this.httpMaxSockets = parseInt(process.env.HTTP_MAX_SOCKETS || '100', 10);
+        this.httpMaxFreeSockets = parseInt(process.env.HTTP_MAX_FREE_SOCKETS || '50', 10);
         
         // Validate critical settings
         this.validate();
     }
     
     validate() {
+        // Falling back to the dev origin in production would silently block the real frontend
+        if (process.env.NODE_ENV === 'production' && !this.corsOriginsConfigured) {
+            throw new Error('CORS_ORIGINS must be set when NODE_ENV=production');
+        }
+
         // At least one AI provider must be configured
         const hasAIProvider = this.openaiApiKey || this.googleApiKey || this.groqApiKey;
         if (!hasAIProvider) {
-            console.warn('⚠️  No AI provider configured. Set OPENAI_API_KEY, GOOGLE_API_KEY, or GROQ_API_KEY');
+            log.warn('⚠️  No AI provider configured. Set OPENAI_API_KEY, GOOGLE_API_KEY, or GROQ_API_KEY');
         }
         
         // Supabase is optional but recommended
         if (!this.supabaseUrl || !this.supabaseKey) {
-            console.warn('⚠️  Supabase not configured. Database features will be disabled.');
+            log.warn('⚠️  Supabase not configured. Database features will be disabled.');
         }
     }
 }
@@ -1,4 +1,7 @@
 import { getSupabaseService } from '../services/supabaseService.js';
+import { createLogger } from '../utils/logger.js';
+
+const log = createLogger('auth');
 
 /**
  * Authentication middleware
@@ -26,22 +29,21 @@ export async function authenticateUser(req, res, next) {
 
         const token = authHeader.substring(7); // Remove 'Bearer ' prefix
 
-        // Verify token using Supabase client
-        const { data, error } = await supabaseService.client.auth.getUser(token);
+        // Verify token with Supabase Auth (briefly cached per token)
+        const user = await supabaseService.getUserForToken(token);
 
-        if (error || !data.user) {
-            console.warn(`Auth token verification failed: ${error?.message || 'Invalid token'}`);
+        if (!user) {
             req.user = null;
             return next();
         }
 
         // Attach verified user to request
-        req.user = data.user;
-        console.log(`✓ Authenticated user: ${data.user.email || data.user.id}`);
+        req.user = user;
+        log.debug(`✓ Authenticated user: ${user.email || user.id}`);
         next();
 
     } catch (error) {
-        console.error(`Auth middleware error: ${error.message}`);
+        log.error(`Auth middleware error: ${error.message}`);
         req.user = null;
         next();
     }
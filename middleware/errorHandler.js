@@ -1,6 +1,10 @@
+import { createLogger } from '../utils/logger.js';
+
+const log = createLogger('http');
+
 // Global error handling middleware
 export function errorHandler(err, req, res, next) {
-    console.error('Error:', err);
+    log.error('Error:', err);
     
     // Zod validation errors
     if (err.name === 'ZodError') {
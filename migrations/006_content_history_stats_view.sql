@@ -0,0 +1,24 @@
+-- Dashboard statistics view
+-- Aggregates content_history server-side so /dashboard/stats
+-- fetches a handful of count rows instead of every history row
+
+-- ============================================
+-- CONTENT HISTORY STATS VIEW
+-- ============================================
+DROP VIEW IF EXISTS content_history_stats;
+
+-- security_invoker keeps the content_history RLS policies in effect
+CREATE VIEW content_history_stats
+WITH (security_invoker = true) AS
+SELECT
+    user_id,
+    content_type,
+    platform,
+    COUNT(*) AS post_count
+FROM content_history
+GROUP BY user_id, content_type, platform;
+
+-- ============================================
+-- SUCCESS MESSAGE
+-- ============================================
+SELECT 'content_history_stats view created successfully!' AS status;
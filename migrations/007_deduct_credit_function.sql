@@ -0,0 +1,42 @@
+-- Atomic credit deduction
+-- Decrements one credit balance in a single UPDATE ... RETURNING so
+-- concurrent requests can't both spend the last credit
+
+-- ============================================
+-- DEDUCT CREDIT FUNCTION
+-- ============================================
+-- Returns the remaining balance, NULL when the user has no credits of
+-- that type left, or -1 when the user has no user_credits row at all
+CREATE OR REPLACE FUNCTION public.deduct_credit(uid UUID, credit_type TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    remaining INTEGER;
+BEGIN
+    IF credit_type = 'text' THEN
+        UPDATE user_credits SET text_credits = text_credits - 1
+        WHERE user_id = uid AND text_credits > 0
+        RETURNING text_credits INTO remaining;
+    ELSIF credit_type = 'image' THEN
+        UPDATE user_credits SET image_credits = image_credits - 1
+        WHERE user_id = uid AND image_credits > 0
+        RETURNING image_credits INTO remaining;
+    ELSIF credit_type = 'video' THEN
+        UPDATE user_credits SET video_credits = video_credits - 1
+        WHERE user_id = uid AND video_credits > 0
+        RETURNING video_credits INTO remaining;
+    ELSE
+        RAISE EXCEPTION 'Invalid credit type: %', credit_type;
+    END IF;
+
+    IF remaining IS NULL AND NOT EXISTS (SELECT 1 FROM user_credits WHERE user_id = uid) THEN
+        RETURN -1;
+    END IF;
+
+    RETURN remaining;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- SUCCESS MESSAGE
+-- ============================================
+SELECT 'deduct_credit function created successfully!' AS status;
@@ -1,5 +1,9 @@
 import { z } from 'zod';
 
+// Request schemas are parsed at the route boundary (untrusted input).
+// Response schemas only document the API shape: handlers build plain objects
+// from trusted service output and DB rows, so never run those through parse().
+
 // ============================================
 // ENUMS
 // ============================================
@@ -43,6 +47,10 @@ export const TextPostRequest = z.object({
     includeEmojis: z.boolean().default(true)
 });
 
+export const TextPostBatchRequest = z.object({
+    requests: z.array(TextPostRequest).min(1).max(500)
+});
+
 export const ContentStats = z.object({
     characters: z.number(),
     words: z.number(),
@@ -92,7 +100,8 @@ export const VideoScriptRequest = z.object({
     platform: Platform,
     tone: Tone,
     goal: Goal,
-    duration: z.string().default('30s')
+    // Normalized and kept short: it becomes part of the response cache partition
+    duration: z.string().trim().toLowerCase().min(1).max(20).default('30s')
 });
 
 export const VideoScriptResponse = z.object({
@@ -106,6 +115,16 @@ export const VideoScriptResponse = z.object({
     creditsRemaining: z.number()
 });
 
+// ============================================
+// UNIFIED GENERATION REQUEST
+// ============================================
+// Tagged on `kind` so zod picks the variant directly instead of trying each
+export const ContentRequest = z.discriminatedUnion('kind', [
+    TextPostRequest.extend({ kind: z.literal('text') }),
+    ImagePostRequest.extend({ kind: z.literal('image') }),
+    VideoScriptRequest.extend({ kind: z.literal('video') })
+]);
+
 // ============================================
 // UGC ADS GENERATION
 // ============================================
@@ -194,8 +213,24 @@ export const ContentHistoryItem = z.object({
     createdAt: z.string()
 });
 
+// Keyset cursor from a previous page's nextCursor: "<created_at>_<id>".
+// Both parts are validated strictly since they end up in a PostgREST filter.
+const Timestamp = z.string().datetime({ offset: true });
+const RowId = z.string().uuid();
+
+export const HistoryCursor = z.string().refine(cursor => {
+    const [createdAt, id, ...rest] = cursor.split('_');
+    return rest.length === 0 && Timestamp.safeParse(createdAt).success && RowId.safeParse(id).success;
+}, 'Invalid history cursor');
+
+export const ContentHistoryQuery = z.object({
+    after: HistoryCursor.optional(),
+    limit: z.coerce.number().int().min(1).max(100).default(20)
+});
+
 export const ContentHistoryResponse = z.object({
-    items: z.array(ContentHistoryItem)
+    items: z.array(ContentHistoryItem),
+    nextCursor: z.string().nullable()
 });
 
 // ============================================
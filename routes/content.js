@@ -1,70 +1,136 @@
 import express from 'express';
 import 'express-async-errors';
-import { getOpenAIService } from '../services/openaiService.js';
-import { getGeminiService } from '../services/geminiService.js';
 import { getSupabaseService } from '../services/supabaseService.js';
-import { authenticateUser } from '../middleware/auth.js';
+import { createLogger } from '../utils/logger.js';
+import { authenticateUser, requireAuth } from '../middleware/auth.js';
 import { 
     TextPostRequest, 
     ImagePostRequest, 
     VideoScriptRequest,
+    ContentRequest,
+    TextPostBatchRequest,
     UGCAdRequest,
-    SaveContentRequest
+    SaveContentRequest,
+    ContentHistoryQuery
 } from '../models/schemas.js';
 
 const router = express.Router();
+const log = createLogger('content');
+
+// Rows fetched per query when streaming history
+const HISTORY_STREAM_PAGE_SIZE = 100;
+
+// History page returned when there is nothing to show; built once and shared
+const EMPTY_HISTORY_PAGE = Object.freeze({ items: Object.freeze([]), nextCursor: null });
+
+// Map image format to aspect ratio
+const FORMAT_TO_ASPECT = Object.freeze({
+    'square': '1:1',
+    'portrait': '4:5',
+    'story': '9:16',
+    'landscape': '16:9'
+});
 
 // Apply auth middleware to all content routes
 router.use(authenticateUser);
 
+// The AI services pull in the OpenAI, Gemini and Groq SDKs, so they are
+// imported on first use instead of at startup (modules are cached after that)
+async function loadOpenAIService() {
+    const { getOpenAIService } = await import('../services/openaiService.js');
+    return getOpenAIService();
+}
+
+async function loadGeminiService() {
+    const { getGeminiService } = await import('../services/geminiService.js');
+    return getGeminiService();
+}
+
 // Helper function to save content to database
-async function saveContentToDb(supabaseService, data, userId = null) {
+// Rows are queued and bulk-inserted in the background so generation responses don't wait on the DB
+function saveContentToDb(supabaseService, data, userId = null) {
     if (supabaseService.isConfigured()) {
-        try {
-            await supabaseService.client.from('content_history').insert({
-                user_id: userId,
-                platform: data.platform,
-                content_type: data.contentType,
-                topic: data.topic,
-                tone: data.tone,
-                goal: data.goal,
-                caption: data.caption,
-                hashtags: data.hashtags,
-                cta: data.cta
-            });
-            console.log(`Content saved to database: ${data.contentType} for ${data.platform} (user: ${userId || 'anonymous'})`);
-        } catch (e) {
-            console.error(`Failed to save content to DB: ${e.message}`);
-        }
+        supabaseService.queueContentHistory({
+            user_id: userId,
+            platform: data.platform,
+            content_type: data.contentType,
+            topic: data.topic,
+            tone: data.tone,
+            goal: data.goal,
+            caption: data.caption,
+            hashtags: data.hashtags,
+            cta: data.cta
+        });
+        log.info(`Content queued for database: ${data.contentType} for ${data.platform} (user: ${userId || 'anonymous'})`);
     }
 }
 
+// Generation dispatch table, keyed by the request `kind`
+const GENERATORS = {
+    text: {
+        generate: (service, request) => service.generateTextPost(request),
+        caption: result => result.caption
+    },
+    image: {
+        generate: (service, request) => service.generateImagePost(request),
+        caption: result => result.caption
+    },
+    video: {
+        generate: (service, request) => service.generateVideoScript(request),
+        caption: result => result.script // Use script as caption for video
+    }
+};
+
+// Queue a generated result for the history table
+function saveGeneratedContent(kind, request, result, userId) {
+    saveContentToDb(getSupabaseService(), {
+        platform: request.platform,
+        contentType: kind,
+        topic: request.topic,
+        tone: request.tone,
+        goal: request.goal,
+        caption: GENERATORS[kind].caption(result),
+        hashtags: result.hashtags,
+        cta: result.cta
+    }, userId);
+}
+
+// Generate content of the given kind and queue it for the history table
+async function generateContent(kind, request, userId) {
+    const openaiService = await loadOpenAIService();
+
+    const result = await GENERATORS[kind].generate(openaiService, request);
+
+    // Save to database
+    saveGeneratedContent(kind, request, result, userId);
+
+    return result;
+}
+
+// POST /content/generate - Generate any content kind (text, image or video)
+router.post('/generate', async (req, res) => {
+    try {
+        const request = ContentRequest.parse(req.body);
+        const result = await generateContent(request.kind, request, req.user?.id);
+        res.json(result);
+    } catch (error) {
+        log.error(`Content generation error: ${error.message}`);
+        res.status(500).json({
+            success: false,
+            error: error.message || 'Content generation failed'
+        });
+    }
+});
+
 // POST /content/generate/text - Generate text post
 router.post('/generate/text', async (req, res) => {
     try {
         // Validate request
-        const request = await TextPostRequest.parseAsync(req.body);
-        
-        const openaiService = getOpenAIService();
-        const supabaseService = getSupabaseService();
-        
-        const result = await openaiService.generateTextPost(request);
-        
-        // Save to database
-        await saveContentToDb(supabaseService, {
-            platform: request.platform,
-            contentType: 'text',
-            topic: request.topic,
-            tone: request.tone,
-            goal: request.goal,
-            caption: result.caption,
-            hashtags: result.hashtags,
-            cta: result.cta
-        }, req.user?.id);
-        
+        const request = TextPostRequest.parse(req.body);
+        const result = await generateContent('text', request, req.user?.id);
         res.json(result);
     } catch (error) {
-        console.error(`Text generation error: ${error.message}`);
+        log.error(`Text generation error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Text generation failed'
@@ -75,28 +141,11 @@ router.post('/generate/text', async (req, res) => {
 // POST /content/generate/image - Generate image post
 router.post('/generate/image', async (req, res) => {
     try {
-        const request = await ImagePostRequest.parseAsync(req.body);
-        
-        const openaiService = getOpenAIService();
-        const supabaseService = getSupabaseService();
-        
-        const result = await openaiService.generateImagePost(request);
-        
-        // Save to database
-        await saveContentToDb(supabaseService, {
-            platform: request.platform,
-            contentType: 'image',
-            topic: request.topic,
-            tone: request.tone,
-            goal: request.goal,
-            caption: result.caption,
-            hashtags: result.hashtags,
-            cta: result.cta
-        }, req.user?.id);
-        
+        const request = ImagePostRequest.parse(req.body);
+        const result = await generateContent('image', request, req.user?.id);
         res.json(result);
     } catch (error) {
-        console.error(`Image generation error: ${error.message}`);
+        log.error(`Image generation error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Image  generation failed'
@@ -107,28 +156,11 @@ router.post('/generate/image', async (req, res) => {
 // POST /content/generate/video - Generate video script
 router.post('/generate/video', async (req, res) => {
     try {
-        const request = await VideoScriptRequest.parseAsync(req.body);
-        
-        const openaiService = getOpenAIService();
-        const supabaseService = getSupabaseService();
-        
-        const result = await openaiService.generateVideoScript(request);
-        
-        // Save to database
-        await saveContentToDb(supabaseService, {
-            platform: request.platform,
-            contentType: 'video',
-            topic: request.topic,
-            tone: request.tone,
-            goal: request.goal,
-            caption: result.script, // Use script as caption for video
-            hashtags: result.hashtags,
-            cta: result.cta
-        }, req.user?.id);
-        
+        const request = VideoScriptRequest.parse(req.body);
+        const result = await generateContent('video', request, req.user?.id);
         res.json(result);
     } catch (error) {
-        console.error(`Video generation error: ${error.message}`);
+        log.error(`Video generation error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Video generation failed'
@@ -136,12 +168,67 @@ router.post('/generate/video', async (req, res) => {
     }
 });
 
+// POST /content/generate/text/batch - Queue text posts on the OpenAI Batch API
+// Cheaper but slow (minutes to hours); poll GET /content/generate/batch/:batchId for results
+router.post('/generate/text/batch', async (req, res) => {
+    try {
+        const { requests } = TextPostBatchRequest.parse(req.body);
+
+        const openaiService = await loadOpenAIService();
+        const batch = await openaiService.submitTextPostBatch(requests, req.user?.id || null);
+
+        res.status(202).json({ success: true, ...batch });
+    } catch (error) {
+        log.error(`Batch submission error: ${error.message}`);
+        res.status(500).json({
+            success: false,
+            error: error.message || 'Batch submission failed'
+        });
+    }
+});
+
+// GET /content/generate/batch/:batchId - Poll a submitted text post batch
+router.get('/generate/batch/:batchId', async (req, res) => {
+    try {
+        const openaiService = await loadOpenAIService();
+        // Batches are only visible to the user who submitted them
+        const batch = await openaiService.pollBatch(req.params.batchId, req.user?.id || null);
+
+        if (!batch) {
+            return res.status(404).json({
+                success: false,
+                error: 'Unknown batch'
+            });
+        }
+
+        // Save finished posts to history once, under the submitting user
+        if (batch.newlyCompleted) {
+            batch.requests.forEach((request, index) => {
+                saveGeneratedContent('text', request, batch.results[index], batch.userId);
+            });
+        }
+
+        res.json({
+            success: true,
+            batchId: batch.batchId,
+            status: batch.status,
+            results: batch.results
+        });
+    } catch (error) {
+        log.error(`Batch poll error: ${error.message}`);
+        res.status(500).json({
+            success: false,
+            error: error.message || 'Failed to fetch batch'
+        });
+    }
+});
+
 // POST /content/generate/ugc-ad - Generate UGC ad
 router.post('/generate/ugc-ad', async (req, res) => {
     try {
-        const request = await UGCAdRequest.parseAsync(req.body);
+        const request = UGCAdRequest.parse(req.body);
         
-        const geminiService = getGeminiService();
+        const geminiService = await loadGeminiService();
         const supabaseService = getSupabaseService();
         
         // Generate content using Gemini
@@ -156,17 +243,10 @@ router.post('/generate/ugc-ad', async (req, res) => {
             additionalDetails: request.additionalDetails
         });
         
-        // Map image format to aspect ratio
-        const formatToAspect = {
-            'square': '1:1',
-            'portrait': '4:5',
-            'story': '9:16',
-            'landscape': '16:9'
-        };
-        const aspectRatio = formatToAspect[request.imageFormat] || '1:1';
+        const aspectRatio = FORMAT_TO_ASPECT[request.imageFormat] || '1:1';
         
         // Generate actual image using Nano Banana API
-        console.log(`Generating image with prompt: ${result.imagePrompt.substring(0, 100)}...`);
+        log.debug(`Generating image with prompt: ${result.imagePrompt.substring(0, 100)}...`);
         const imageResult = await geminiService.generateImage(
             result.imagePrompt,
             aspectRatio,
@@ -177,65 +257,63 @@ router.post('/generate/ugc-ad', async (req, res) => {
         let generatedImageUrl = null;
         if (imageResult.success && imageResult.images.length > 0) {
             const imageBase64 = imageResult.images[0].data;
-            console.log('✓ Image generated successfully!');
-            console.log(`Image data format: ${imageBase64.substring(0, 30)}...`);
+            log.info('✓ Image generated successfully!');
+            log.debug(`Image data format: ${imageBase64.substring(0, 30)}...`);
             
             // Upload to Supabase Storage
-            console.log(`Supabase configured: ${supabaseService.isConfigured()}`);
+            log.debug(`Supabase configured: ${supabaseService.isConfigured()}`);
             if (supabaseService.isConfigured()) {
                 try {
-                    console.log(`Attempting to upload image to Supabase storage bucket: ugc-ads`);
+                    log.debug(`Attempting to upload image to Supabase storage bucket: ugc-ads`);
                     generatedImageUrl = await supabaseService.uploadImageToStorage(
                         imageBase64,
                         `${request.productName.replace(/\s/g, '_')}_${Date.now()}.png`,
                         'ugc-ads'
                     );
-                    console.log(`✅ SUCCESS! Image uploaded to storage: ${generatedImageUrl}`);
+                    log.info(`✅ SUCCESS! Image uploaded to storage: ${generatedImageUrl}`);
                 } catch (e) {
-                    console.error(`❌ UPLOAD FAILED: ${e.message}`);
-                    console.error(`Error stack: ${e.stack}`);
+                    log.error('❌ UPLOAD FAILED:', e);
                     generatedImageUrl = imageBase64;
                 }
             } else {
-                console.warn('⚠️ Supabase not configured, using base64');
+                log.warn('⚠️ Supabase not configured, using base64');
                 // Fallback to base64 if Supabase not configured
                 generatedImageUrl = imageBase64;
             }
         } else {
-            console.error(`Image generation failed: ${imageResult.error || 'Unknown error'}`);
+            log.error(`Image generation failed: ${imageResult.error || 'Unknown error'}`);
         }
         
-        // Save to ugc_ads table in database
+        // Save to ugc_ads table in database, in the background so the
+        // response doesn't wait on the insert
         if (supabaseService.isConfigured()) {
-            try {
-                // Get user ID from authenticated request
-                const userId = req.user?.id || null;
-                
-                await supabaseService.client.from('ugc_ads').insert({
-                    user_id: userId,
-                    product_name: request.productName,
-                    product_description: request.productDescription,
-                    target_audience: request.targetAudience,
-                    ad_type: request.adType,
-                    image_format: request.imageFormat,
-                    visual_style: request.visualStyle,
-                    mood: request.mood,
-                    additional_details: request.additionalDetails,
-                    image_prompt: result.imagePrompt,
-                    caption: result.caption,
-                    hashtags: result.hashtags,
-                    cta: result.cta,
-                    estimated_reach: result.stats.estimatedReach,
-                    engagement_rate: result.stats.engagementRate,
-                    recommended_budget: result.stats.recommendedBudget,
-                    best_time_to_post: result.stats.bestTimeToPost,
-                    product_image_url: generatedImageUrl,
-                    credits_used: 2
-                });
-                console.log(`UGC ad saved to database for product: ${request.productName}`);
-            } catch (e) {
-                console.error(`Failed to save UGC ad to database: ${e.message}`);
-            }
+            // Get user ID from authenticated request
+            const userId = req.user?.id || null;
+
+            const ugcAd = {
+                user_id: userId,
+                product_name: request.productName,
+                product_description: request.productDescription,
+                target_audience: request.targetAudience,
+                ad_type: request.adType,
+                image_format: request.imageFormat,
+                visual_style: request.visualStyle,
+                mood: request.mood,
+                additional_details: request.additionalDetails,
+                image_prompt: result.imagePrompt,
+                caption: result.caption,
+                hashtags: result.hashtags,
+                cta: result.cta,
+                estimated_reach: result.stats.estimatedReach,
+                engagement_rate: result.stats.engagementRate,
+                recommended_budget: result.stats.recommendedBudget,
+                best_time_to_post: result.stats.bestTimeToPost,
+                product_image_url: generatedImageUrl,
+                credits_used: 2
+            };
+            await supabaseService.runInBackground(`UGC ad for product: ${request.productName}`, () =>
+                supabaseService.client.from('ugc_ads').insert(ugcAd)
+            );
         }
         
         // Return response with generated image
@@ -251,7 +329,7 @@ router.post('/generate/ugc-ad', async (req, res) => {
             generatedImageUrl
         });
     } catch (error) {
-        console.error(`UGC ad generation error: ${error.message}`);
+        log.error(`UGC ad generation error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'UGC ad generation failed'
@@ -262,7 +340,7 @@ router.post('/generate/ugc-ad', async (req, res) => {
 // POST /content/save - Save content to history
 router.post('/save', async (req, res) => {
     try {
-        const request = await SaveContentRequest.parseAsync(req.body);
+        const request = SaveContentRequest.parse(req.body);
         
         const supabaseService = getSupabaseService();
         
@@ -294,7 +372,7 @@ router.post('/save', async (req, res) => {
         
         const recordId = data && data.length > 0 ? data[0].id : 'unknown';
         
-        console.log(`✅ Content saved by ${req.user?.email || 'anonymous'} (ID: ${userId})`);
+        log.info(`✅ Content saved by ${req.user?.email || 'anonymous'} (ID: ${userId})`);
         
         res.json({
             success: true,
@@ -302,7 +380,7 @@ router.post('/save', async (req, res) => {
             message: 'Content saved to history successfully'
         });
     } catch (error) {
-        console.error(`Failed to save content to history: ${error.message}`);
+        log.error(`Failed to save content to history: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Failed to save content'
@@ -310,40 +388,149 @@ router.post('/save', async (req, res) => {
     }
 });
 
+/**
+ * One page of content_history, newest first, after an optional cursor,
+ * limited to one user's rows when `userId` is given.
+ * Pages are keyed on (created_at, id): bulk inserts give whole batches the
+ * same created_at, so the id breaks ties and no row is skipped at a page boundary.
+ */
+function historyPageQuery(supabaseService, cursor, limit, userId = null) {
+    let query = supabaseService.client
+        .from('content_history')
+        .select('*')
+        .order('created_at', { ascending: false })
+        .order('id', { ascending: false })
+        .limit(limit);
+
+    if (userId) {
+        query = query.eq('user_id', userId);
+    }
+
+    if (cursor) {
+        // Values are quoted since timestamps contain PostgREST reserved characters (. and :)
+        const [createdAt, id] = cursor.split('_');
+        query = query.or(`created_at.lt."${createdAt}",and(created_at.eq."${createdAt}",id.lt."${id}")`);
+    }
+
+    return query;
+}
+
+// Cursor pointing just past `row` (see HistoryCursor in models/schemas.js)
+function historyCursor(row) {
+    return `${row.created_at}_${row.id}`;
+}
+
+// Map a content_history row to its API shape
+function toHistoryItem(item) {
+    return {
+        id: String(item.id || ''),
+        contentType: item.content_type || '',
+        platform: item.platform || '',
+        topic: item.topic || '',
+        caption: item.caption || '',
+        hashtags: item.hashtags || [],
+        cta: item.cta || '',
+        createdAt: item.created_at || ''
+    };
+}
+
+// Resolve once the socket can take more data (or the client went away)
+function waitForDrain(res) {
+    return new Promise(resolve => {
+        const done = () => {
+            res.off('drain', done);
+            res.off('close', done);
+            resolve();
+        };
+        res.on('drain', done);
+        res.on('close', done);
+    });
+}
+
 // GET /content/history - Get content history
+// Cursor-paginated: pass the previous page's nextCursor as ?after=
 router.get('/history', async (req, res) => {
+    const { after, limit } = ContentHistoryQuery.parse(req.query);
+
     try {
         const supabaseService = getSupabaseService();
         
         if (!supabaseService.isConfigured()) {
-            return res.json({ items: [] });
+            return res.json(EMPTY_HISTORY_PAGE);
+        }
+
+        // Answer polling clients with 304 while the history is unchanged
+        const version = await supabaseService.getContentHistoryVersion();
+        if (version) {
+            res.set('Cache-Control', 'private, no-cache');
+            res.set('ETag', `W/"history-${version}-${limit}-${after || ''}"`);
+            if (req.fresh) {
+                return res.status(304).end();
+            }
         }
         
         // Fetch from database
-        const { data, error } = await supabaseService.client
-            .from('content_history')
-            .select('*')
-            .order('created_at', { ascending: false })
-            .limit(50);
+        const { data, error } = await historyPageQuery(supabaseService, after, limit);
         
         if (error) throw error;
         
-        const items = (data || []).map(item => ({
-            id: String(item.id || ''),
-            contentType: item.content_type || '',
-            platform: item.platform || '',
-            topic: item.topic || '',
-            caption: item.caption || '',
-            hashtags: item.hashtags || [],
-            cta: item.cta || '',
-            createdAt: item.created_at || ''
-        }));
+        const rows = data || [];
+        const items = rows.map(toHistoryItem);
+
+        // A full page means older rows may remain
+        const nextCursor = rows.length === limit ? historyCursor(rows[rows.length - 1]) : null;
         
-        res.json({ items });
+        res.json({ items, nextCursor });
+    } catch (error) {
+        log.error(`Failed to fetch content history: ${error.message}`);
+        res.removeHeader('ETag');
+        res.json(EMPTY_HISTORY_PAGE);
+    }
+});
+
+// GET /content/history/stream - Stream the signed-in user's content history as NDJSON
+// One item per line, fetched page by page so the whole history is never held in memory
+router.get('/history/stream', requireAuth, async (req, res) => {
+    const supabaseService = getSupabaseService();
+
+    res.type('application/x-ndjson');
+
+    if (!supabaseService.isConfigured()) {
+        return res.end();
+    }
+
+    try {
+        let after = null;
+
+        while (!res.destroyed) {
+            const { data, error } = await historyPageQuery(supabaseService, after, HISTORY_STREAM_PAGE_SIZE, req.user.id);
+
+            if (error) throw error;
+
+            const rows = data || [];
+            if (rows.length > 0) {
+                const chunk = rows.map(row => JSON.stringify(toHistoryItem(row))).join('\n') + '\n';
+                if (!res.write(chunk)) {
+                    await waitForDrain(res);
+                }
+            }
+
+            if (rows.length < HISTORY_STREAM_PAGE_SIZE) break;
+            after = historyCursor(rows[rows.length - 1]);
+        }
     } catch (error) {
-        console.error(`Failed to fetch content history: ${error.message}`);
-        res.json({ items: [] });
+        log.error(`Failed to stream content history: ${error.message}`);
+        if (!res.headersSent) {
+            return res.status(500).json({
+                success: false,
+                error: error.message || 'Failed to stream content history'
+            });
+        }
+        // Abort instead of ending cleanly so the client can tell the stream was cut short
+        return res.destroy(error);
     }
+
+    res.end();
 });
 
 export default router;
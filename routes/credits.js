@@ -1,8 +1,13 @@
 import express from 'express';
 import 'express-async-errors';
 import { getSupabaseService } from '../services/supabaseService.js';
+import { createLogger } from '../utils/logger.js';
 
 const router = express.Router();
+const log = createLogger('credits');
+
+// Credit types accepted by /credits/deduct
+const CREDIT_TYPES = new Set(['text', 'image', 'video']);
 
 // GET /credits - Get user credits
 router.get('/', async (req, res) => {
@@ -15,14 +20,14 @@ router.get('/', async (req, res) => {
         const credits = await supabaseService.getUserCredits(userId);
         
         res.json({
-            textCredits: credits.text || 150,
-            imageCredits: credits.image || 25,
-            videoCredits: credits.video || 10,
-            totalCredits: (credits.text || 150) + (credits.image || 25) + (credits.video || 10),
+            textCredits: credits.text,
+            imageCredits: credits.image,
+            videoCredits: credits.video,
+            totalCredits: credits.total,
             plan: 'free'
         });
     } catch (error) {
-        console.error(`Credits fetch error: ${error.message}`);
+        log.error(`Credits fetch error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Failed to fetch credits'
@@ -35,7 +40,7 @@ router.post('/deduct', async (req, res) => {
     try {
         const { creditType, amount = 1 } = req.body;
         
-        if (!creditType || !['text', 'image', 'video'].includes(creditType)) {
+        if (!CREDIT_TYPES.has(creditType)) {
             return res.status(400).json({
                 success: false,
                 message: 'Invalid credit type. Must be text, image, or video.'
@@ -47,13 +52,12 @@ router.post('/deduct', async (req, res) => {
         // TODO: Get actual user_id from authentication
         const userId = '00000000-0000-0000-0000-000000000000';
         
-        const success = await supabaseService.deductCredit(userId, creditType);
+        const { deducted, remaining } = await supabaseService.deductCredit(userId, creditType);
         
-        if (success) {
-            const credits = await supabaseService.getUserCredits(userId);
+        if (deducted) {
             res.json({
                 success: true,
-                creditsRemaining: credits[creditType] || 0,
+                creditsRemaining: remaining ?? 0,
                 message: `${amount} ${creditType} credit(s) deducted successfully`
             });
         } else {
@@ -64,7 +68,7 @@ router.post('/deduct', async (req, res) => {
             });
         }
     } catch (error) {
-        console.error(`Credits deduction error: ${error.message}`);
+        log.error(`Credits deduction error: ${error.message}`);
         res.status(500).json({
             success: false,
             error: error.message || 'Failed to deduct credits'
@@ -1,13 +1,102 @@
 import express from 'express';
 import 'express-async-errors';
 import { getSupabaseService } from '../services/supabaseService.js';
+import { createLogger } from '../utils/logger.js';
 import { authenticateUser } from '../middleware/auth.js';
 
 const router = express.Router();
+const log = createLogger('dashboard');
 
 // Apply auth middleware to dashboard routes
 router.use(authenticateUser);
 
+// Date#toLocaleDateString() creates a new Intl formatter per call; reuse one
+// (same default locale and time zone)
+const DATE_FORMAT = new Intl.DateTimeFormat();
+
+function formatDate(timestamp) {
+    const time = Date.parse(timestamp);
+    return Number.isNaN(time) ? 'Invalid Date' : DATE_FORMAT.format(time);
+}
+
+// Dashboard payload for when there is no data; built once and shared
+const EMPTY_DASHBOARD = Object.freeze({
+    stats: Object.freeze({
+        postsGenerated: 0,
+        imagesCreated: 0,
+        videosMade: 0,
+        timeSaved: '0hrs',
+        postsChange: '+0%',
+        imagesChange: '+0%',
+        videosChange: '+0%',
+        timeChange: '+0%'
+    }),
+    recentContent: Object.freeze([]),
+    platformStats: Object.freeze([])
+});
+
+const EMPTY_ITEMS = Object.freeze({ items: Object.freeze([]) });
+
+// Map a content_history row to a /dashboard/stats recent content entry
+function toRecentContentItem(item) {
+    return {
+        id: String(item.id),
+        title: item.caption?.substring(0, 50) + (item.caption?.length > 50 ? '...' : '') || item.topic || 'Untitled',
+        platform: item.platform || 'unknown',
+        contentType: item.content_type || 'text',
+        createdAt: formatDate(item.created_at),
+        icon: ''
+    };
+}
+
+// Map a content_history row to a /dashboard/recent item
+function toRecentListItem(item) {
+    return {
+        id: String(item.id || ''),
+        contentType: item.content_type || '',
+        platform: item.platform || '',
+        topic: item.topic || '',
+        caption: item.caption || '',
+        createdAt: item.created_at || ''
+    };
+}
+
+// Map a content_history row to a /dashboard/history entry
+function toContentHistoryEntry(item) {
+    return {
+        id: String(item.id),
+        type: item.content_type || 'text',
+        platform: item.platform,
+        contentType: item.content_type,
+        topic: item.topic,
+        caption: item.caption,
+        hashtags: item.hashtags || [],
+        cta: item.cta,
+        createdAt: item.created_at,
+        isFavorite: item.is_favorite || false
+    };
+}
+
+// Map a ugc_ads row to a /dashboard/history entry
+function toUgcHistoryEntry(item) {
+    return {
+        id: String(item.id),
+        type: 'ugc_ad',
+        productName: item.product_name,
+        caption: item.caption,
+        hashtags: item.hashtags || [],
+        cta: item.cta,
+        imageUrl: item.product_image_url,
+        imagePrompt: item.image_prompt,
+        adType: item.ad_type,
+        mood: item.mood,
+        visualStyle: item.visual_style,
+        imageFormat: item.image_format,
+        createdAt: item.created_at,
+        isFavorite: item.is_favorite || false
+    };
+}
+
 // GET /dashboard/stats - Get comprehensive dashboard statistics
 router.get('/stats', async (req, res) => {
     try {
@@ -15,48 +104,66 @@ router.get('/stats', async (req, res) => {
         
         // Default response if Supabase not configured
         if (!supabaseService.isConfigured()) {
-            return res.json({
-                stats: {
-                    postsGenerated: 0,
-                    imagesCreated: 0,
-                    videosMade: 0,
-                    timeSaved: '0hrs',
-                    postsChange: '+0%',
-                    imagesChange: '+0%',
-                    videosChange: '+0%',
-                    timeChange: '+0%'
-                },
-                recentContent: [],
-                platformStats: []
-            });
+            return res.json(EMPTY_DASHBOARD);
         }
 
         // Get user ID from authenticated request (null for anonymous)
         const userId = req.user?.id || null;
 
-        // Fetch content history for the user
-        let query = supabaseService.client
+        // Answer polling clients with 304 while their history is unchanged
+        const version = await supabaseService.getContentHistoryVersion(userId);
+        if (version) {
+            res.set('Cache-Control', 'private, no-cache');
+            res.set('ETag', `W/"stats-${userId || 'anon'}-${version}"`);
+            if (req.fresh) {
+                return res.status(304).end();
+            }
+        }
+
+        // Per (content_type, platform) counts are aggregated in Postgres
+        let statsQuery = supabaseService.client
+            .from('content_history_stats')
+            .select('content_type, platform, post_count');
+
+        // Only the latest rows are needed for the recent content list
+        let recentQuery = supabaseService.client
             .from('content_history')
-            .select('*')
-            .order('created_at', { ascending: false });
+            .select('id, caption, topic, platform, content_type, created_at')
+            .order('created_at', { ascending: false })
+            .limit(5);
 
         // Filter by user if authenticated
         if (userId) {
-            query = query.eq('user_id', userId);
+            statsQuery = statsQuery.eq('user_id', userId);
+            recentQuery = recentQuery.eq('user_id', userId);
         }
 
-        const { data: allContent, error } = await query;
+        const [
+            { data: statsRows, error },
+            { data: recentRows, error: recentError }
+        ] = await Promise.all([statsQuery, recentQuery]);
 
-        if (error) {
-            console.error(`Dashboard query error: ${error.message}`);
-            throw error;
+        if (error || recentError) {
+            const queryError = error || recentError;
+            log.error(`Dashboard query error: ${queryError.message}`);
+            throw queryError;
         }
 
         // Calculate statistics
-        const totalPosts = allContent?.length || 0;
-        const textPosts = allContent?.filter(c => c.content_type === 'text').length || 0;
-        const imagePosts = allContent?.filter(c => c.content_type === 'image').length || 0;
-        const videoPosts = allContent?.filter(c => c.content_type === 'video').length || 0;
+        let totalPosts = 0;
+        const typeCounts = {};
+        const platformCounts = {};
+        (statsRows || []).forEach(row => {
+            const count = Number(row.post_count) || 0;
+            const platform = row.platform || 'unknown';
+            totalPosts += count;
+            typeCounts[row.content_type] = (typeCounts[row.content_type] || 0) + count;
+            platformCounts[platform] = (platformCounts[platform] || 0) + count;
+        });
+
+        const textPosts = typeCounts.text || 0;
+        const imagePosts = typeCounts.image || 0;
+        const videoPosts = typeCounts.video || 0;
 
         // Calculate time saved (rough estimate: 15 min per post)
         const totalMinutes = totalPosts * 15;
@@ -64,22 +171,9 @@ router.get('/stats', async (req, res) => {
         const timeSaved = hours > 0 ? `${hours}hrs` : `${totalMinutes}min`;
 
         // Get recent 5 items
-        const recentContent = (allContent || []).slice(0, 5).map(item => ({
-            id: String(item.id),
-            title: item.caption?.substring(0, 50) + (item.caption?.length > 50 ? '...' : '') || item.topic || 'Untitled',
-            platform: item.platform || 'unknown',
-            contentType: item.content_type || 'text',
-            createdAt: new Date(item.created_at).toLocaleDateString(),
-            icon: ''
-        }));
+        const recentContent = (recentRows || []).map(toRecentContentItem);
 
         // Calculate platform statistics
-        const platformCounts = {};
-        (allContent || []).forEach(item => {
-            const platform = item.platform || 'unknown';
-            platformCounts[platform] = (platformCounts[platform] || 0) + 1;
-        });
-
         const platformStats = Object.entries(platformCounts)
             .map(([platform, count]) => ({
                 platform: platform.charAt(0).toUpperCase() + platform.slice(1),
@@ -105,22 +199,10 @@ router.get('/stats', async (req, res) => {
         });
 
     } catch (error) {
-        console.error(`Dashboard stats error: ${error.message}`);
-        // Return empty data on error instead of failing
-        res.json({
-            stats: {
-                postsGenerated: 0,
-                imagesCreated: 0,
-                videosMade: 0,
-                timeSaved: '0hrs',
-                postsChange: '+0%',
-                imagesChange: '+0%',
-                videosChange: '+0%',
-                timeChange: '+0%'
-            },
-            recentContent: [],
-            platformStats: []
-        });
+        log.error(`Dashboard stats error: ${error.message}`);
+        // Return empty data on error instead of failing (and don't let it be cached)
+        res.removeHeader('ETag');
+        res.json(EMPTY_DASHBOARD);
     }
 });
 
@@ -130,7 +212,7 @@ router.get('/recent', async (req, res) => {
         const supabaseService = getSupabaseService();
         
         if (!supabaseService.isConfigured()) {
-            return res.json({ items: [] });
+            return res.json(EMPTY_ITEMS);
         }
         
         const userId = req.user?.id || null;
@@ -150,22 +232,43 @@ router.get('/recent', async (req, res) => {
         
         if (error) throw error;
         
-        const items = (data || []).map(item => ({
-            id: String(item.id || ''),
-            contentType: item.content_type || '',
-            platform: item.platform || '',
-            topic: item.topic || '',
-            caption: item.caption || '',
-            createdAt: item.created_at || ''
-        }));
+        const items = (data || []).map(toRecentListItem);
         
         res.json({ items });
     } catch (error) {
-        console.error(`Dashboard recent error: ${error.message}`);
-        res.json({ items: [] });
+        log.error(`Dashboard recent error: ${error.message}`);
+        res.json(EMPTY_ITEMS);
     }
 });
 
+// Merge two lists that are each sorted newest first into one sorted list.
+// A single linear pass that parses each timestamp once, instead of
+// concatenating and re-sorting with two Date parses per comparison.
+// Ties keep items from `left` first, matching the previous stable sort.
+function mergeNewestFirst(left, right) {
+    const timeOf = item => Date.parse(item.createdAt) || 0;
+    const merged = [];
+    let i = 0;
+    let j = 0;
+    let leftTime = left.length > 0 ? timeOf(left[0]) : 0;
+    let rightTime = right.length > 0 ? timeOf(right[0]) : 0;
+
+    while (i < left.length && j < right.length) {
+        if (leftTime >= rightTime) {
+            merged.push(left[i++]);
+            if (i < left.length) leftTime = timeOf(left[i]);
+        } else {
+            merged.push(right[j++]);
+            if (j < right.length) rightTime = timeOf(right[j]);
+        }
+    }
+
+    while (i < left.length) merged.push(left[i++]);
+    while (j < right.length) merged.push(right[j++]);
+
+    return merged;
+}
+
 // GET /dashboard/history - Get comprehensive content history (text posts + UGC ads)
 router.get('/history', async (req, res) => {
     try {
@@ -187,12 +290,6 @@ router.get('/history', async (req, res) => {
             contentQuery = contentQuery.eq('user_id', userId);
         }
 
-        const { data: contentHistory, error: contentError } = await contentQuery;
-
-        if (contentError) {
-            console.error(`Content history query error: ${contentError.message}`);
-        }
-
         // Fetch UGC Ads
         let ugcQuery = supabaseService.client
             .from('ugc_ads')
@@ -203,58 +300,31 @@ router.get('/history', async (req, res) => {
             ugcQuery = ugcQuery.eq('user_id', userId);
         }
 
-        const { data: ugcAds, error: ugcError } = await ugcQuery;
+        // Both queries are independent, so run them concurrently
+        const [
+            { data: contentHistory, error: contentError },
+            { data: ugcAds, error: ugcError }
+        ] = await Promise.all([contentQuery, ugcQuery]);
 
-        if (ugcError) {
-            console.error(`UGC ads query error: ${ugcError.message}`);
+        if (contentError) {
+            log.error(`Content history query error: ${contentError.message}`);
         }
 
-        // Transform and combine data
-        const historyItems = [];
-
-        // Add content history items
-        (contentHistory || []).forEach(item => {
-            historyItems.push({
-                id: String(item.id),
-                type: item.content_type || 'text',
-                platform: item.platform,
-                contentType: item.content_type,
-                topic: item.topic,
-                caption: item.caption,
-                hashtags: item.hashtags || [],
-                cta: item.cta,
-                createdAt: item.created_at,
-                isFavorite: item.is_favorite || false
-            });
-        });
+        if (ugcError) {
+            log.error(`UGC ads query error: ${ugcError.message}`);
+        }
 
-        // Add UGC ads items
-        (ugcAds || []).forEach(item => {
-            historyItems.push({
-                id: String(item.id),
-                type: 'ugc_ad',
-                productName: item.product_name,
-                caption: item.caption,
-                hashtags: item.hashtags || [],
-                cta: item.cta,
-                imageUrl: item.product_image_url,
-                imagePrompt: item.image_prompt,
-                adType: item.ad_type,
-                mood: item.mood,
-                visualStyle: item.visual_style,
-                imageFormat: item.image_format,
-                createdAt: item.created_at,
-                isFavorite: item.is_favorite || false
-            });
-        });
+        // Transform both result sets (each is already ordered newest first)
+        const contentItems = (contentHistory || []).map(toContentHistoryEntry);
+        const ugcItems = (ugcAds || []).map(toUgcHistoryEntry);
 
-        // Sort by created_at descending
-        historyItems.sort((a, b) => new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime());
+        // Combine into one list sorted by created_at descending
+        const historyItems = mergeNewestFirst(contentItems, ugcItems);
 
         res.json(historyItems);
 
     } catch (error) {
-        console.error(`Dashboard history error: ${error.message}`);
+        log.error(`Dashboard history error: ${error.message}`);
         res.json([]);
     }
 });
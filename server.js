@@ -6,9 +6,13 @@ import contentRoutes from './routes/content.js';
 import creditsRoutes from './routes/credits.js';
 import dashboardRoutes from './routes/dashboard.js';
 import errorHandler from './middleware/errorHandler.js';
+import { getSupabaseService } from './services/supabaseService.js';
+import { httpAgent } from './utils/httpAgent.js';
+import { createLogger } from './utils/logger.js';
 
 // Initialize settings
 const settings = getSettings();
+const log = createLogger('server');
 
 // Create Express app
 const app = express();
@@ -17,15 +21,7 @@ const app = express();
 app.use(express.json({ limit: '50mb' })); // Increased limit for base64 images
 app.use(express.urlencoded({ extended: true, limit: '50mb' }));
 
-// Configure CORS - Allow all origins for development
-app.use(cors({
-    origin: '*',
-    credentials: false,
-    methods: ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'PATCH'],
-    allowedHeaders: ['*']
-}));
-
-// Health check endpoints
+// Health check endpoints (no CORS; used by load balancers and uptime probes)
 app.get('/', (req, res) => {
     res.json({
         status: 'healthy',
@@ -42,6 +38,17 @@ app.get('/health', (req, res) => {
     });
 });
 
+// Configure CORS - only the configured frontend origins, and only the headers
+// the frontend sends; browsers cache preflight results for 24h (maxAge).
+// Registered after the health checks so probes skip it.
+app.use(cors({
+    origin: settings.corsOrigins.includes('*') ? '*' : settings.corsOrigins,
+    credentials: false,
+    methods: ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'PATCH'],
+    allowedHeaders: ['Authorization', 'Content-Type'],
+    maxAge: 86400
+}));
+
 // API Routes
 app.use('/content', contentRoutes);
 app.use('/credits', creditsRoutes);
@@ -54,7 +61,7 @@ app.use(errorHandler);
 const PORT = settings.port;
 const HOST = settings.host;
 
-app.listen(PORT, HOST, () => {
+const server = app.listen(PORT, HOST, () => {
     console.log('='.repeat(60));
     console.log(`🚀 CraftlyPost API Server`);
     console.log('='.repeat(60));
@@ -70,6 +77,47 @@ app.listen(PORT, HOST, () => {
     console.log('='.repeat(60));
     console.log('Ready to generate content! 🎨');
     console.log('='.repeat(60));
+
+    if (settings.warmUpOnStart) {
+        warmUp().catch(e => log.warn(`Warm-up failed: ${e.message}`));
+    }
 });
 
+// Optional (WARM_UP_ON_START): build the service singletons and open provider
+// connections once the port is bound, so the first request doesn't pay for SDK
+// loading and TLS handshakes. This gives up the lazy AI SDK imports in
+// routes/content.js, trading memory and background startup work for a faster
+// first request, so it is off by default.
+async function warmUp() {
+    getSupabaseService();
+    const [{ getOpenAIService }, { getGeminiService }] = await Promise.all([
+        import('./services/openaiService.js'),
+        import('./services/geminiService.js')
+    ]);
+    getGeminiService();
+    await getOpenAIService().warmUp();
+    log.info('Services warmed up');
+}
+
+// Longest wait for in-flight requests before shutting down anyway
+const SHUTDOWN_TIMEOUT_MS = 10000;
+
+// Graceful shutdown: stop accepting requests and let in-flight ones finish (they
+// may still queue history rows), then finish pending DB writes, close pooled sockets
+async function shutdown(signal) {
+    log.info(`${signal} received, shutting down...`);
+    await new Promise(resolve => {
+        server.close(resolve);
+        setTimeout(resolve, SHUTDOWN_TIMEOUT_MS).unref();
+    });
+    const supabaseService = getSupabaseService();
+    await supabaseService.flushContentHistory();
+    await supabaseService.drainPendingWrites();
+    httpAgent.destroy();
+    process.exit(0);
+}
+
+process.on('SIGINT', () => shutdown('SIGINT'));
+process.on('SIGTERM', () => shutdown('SIGTERM'));
+
 export default app;
@@ -1,28 +1,53 @@
-import { GoogleGenerativeAI } from '@google/generative-ai';
 import { GoogleGenAI } from '@google/genai';
 import { getSettings } from '../config/index.js';
+import { parseModelJson } from '../utils/json.js';
+import { createLogger } from '../utils/logger.js';
+
+const log = createLogger('gemini');
+
+// Map format IDs to dimensions
+const FORMAT_MAP = Object.freeze({
+    'square': { aspect: '1:1', dimensions: '1080x1080', platforms: 'Instagram, Facebook' },
+    'portrait': { aspect: '4:5', dimensions: '1080x1350', platforms: 'Instagram Feed' },
+    'story': { aspect: '9:16', dimensions: '1080x1920', platforms: 'Stories, Reels' },
+    'landscape': { aspect: '16:9', dimensions: '1920x1080', platforms: 'YouTube, Twitter' }
+});
+
+// Map style IDs to descriptions
+const STYLE_MAP = Object.freeze({
+    'authentic': 'Raw, real, unpolished',
+    'minimal': 'Clean, simple, modern',
+    'vibrant': 'Bold, colorful, energetic',
+    'professional': 'Polished, studio-quality'
+});
+
+// Map ad type IDs to names
+const AD_TYPE_MAP = Object.freeze({
+    'testimonial': 'Testimonial',
+    'before-after': 'Before/After',
+    'unboxing': 'Unboxing',
+    'lifestyle': 'Lifestyle',
+    'product-showcase': 'Product Focus',
+    'user-story': 'User Story'
+});
 
 class GeminiService {
     constructor(apiKey) {
         this.apiKey = apiKey;
-        this.client = null;  // Old SDK for text generation
-        this.genaiClient = null;  // New SDK for image generation
+        this.genaiClient = null;  // Single SDK client for text and image generation
         
         if (apiKey) {
             try {
-                // Old SDK for text generation
-                this.client = new GoogleGenerativeAI(apiKey);
-                // New SDK for image generation (Nano Banana)
                 this.genaiClient = new GoogleGenAI({ apiKey: apiKey });
-                console.log('✓ Gemini service configured');
+                log.info('✓ Gemini service configured');
             } catch (e) {
-                console.error(`✗ Gemini service init failed: ${e.message}`);
+                log.error(`✗ Gemini service init failed: ${e.message}`);
             }
         }
     }
 
     isConfigured() {
-        return !!(this.client && this.apiKey);
+        return !!(this.genaiClient && this.apiKey);
     }
 
     async generateUGCAdContent({
@@ -39,35 +64,9 @@ class GeminiService {
             throw new Error('Gemini API is not configured. Please set GOOGLE_API_KEY in .env');
         }
 
-        // Map format IDs to dimensions
-        const formatMap = {
-            'square': { aspect: '1:1', dimensions: '1080x1080', platforms: 'Instagram, Facebook' },
-            'portrait': { aspect: '4:5', dimensions: '1080x1350', platforms: 'Instagram Feed' },
-            'story': { aspect: '9:16', dimensions: '1080x1920', platforms: 'Stories, Reels' },
-            'landscape': { aspect: '16:9', dimensions: '1920x1080', platforms: 'YouTube, Twitter' }
-        };
-
-        // Map style IDs to descriptions
-        const styleMap = {
-            'authentic': 'Raw, real, unpolished',
-            'minimal': 'Clean, simple, modern',
-            'vibrant': 'Bold, colorful, energetic',
-            'professional': 'Polished, studio-quality'
-        };
-
-        // Map ad type IDs to names
-        const adTypeMap = {
-            'testimonial': 'Testimonial',
-            'before-after': 'Before/After',
-            'unboxing': 'Unboxing',
-            'lifestyle': 'Lifestyle',
-            'product-showcase': 'Product Focus',
-            'user-story': 'User Story'
-        };
-
-        const formatInfo = formatMap[imageFormat] || formatMap['square'];
-        const styleDesc = styleMap[visualStyle] || 'authentic';
-        const adTypeName = adTypeMap[adType] || adType;
+        const formatInfo = FORMAT_MAP[imageFormat] || FORMAT_MAP['square'];
+        const styleDesc = STYLE_MAP[visualStyle] || 'authentic';
+        const adTypeName = AD_TYPE_MAP[adType] || adType;
 
         // Build comprehensive prompt for Gemini
         const prompt = `You are a UGC (User Generated Content) ad expert. Generate comprehensive ad content for the following product:
@@ -101,31 +100,16 @@ Respond ONLY with valid JSON in this exact format:
 }`;
 
         try {
-            const model = this.client.getGenerativeModel({
+            const response = await this.genaiClient.models.generateContent({
                 model: 'gemini-1.5-flash',
-                generationConfig: {
+                contents: prompt,
+                config: {
                     temperature: 0.8,
                     maxOutputTokens: 2048
                 }
             });
-
-            const result = await model.generateContent(prompt);
-            let responseText = result.response.text().trim();
-
-            // Remove markdown code blocks if present
-            if (responseText.startsWith('```json')) {
-                responseText = responseText.substring(7);
-            }
-            if (responseText.startsWith('```')) {
-                responseText = responseText.substring(3);
-            }
-            if (responseText.endsWith('```')) {
-                responseText = responseText.substring(0, responseText.length - 3);
-            }
-            responseText = responseText.trim();
-
-            // Parse JSON response
-            const parsedResult = JSON.parse(responseText);
+            // Parse JSON response (the model sometimes wraps it in a code fence)
+            const parsedResult = parseModelJson(response.text || '');
 
             // Add stats
             parsedResult.stats = {
@@ -138,7 +122,7 @@ Respond ONLY with valid JSON in this exact format:
             return parsedResult;
 
         } catch (error) {
-            console.error(`Gemini API error: ${error.message}`);
+            log.error(`Gemini API error: ${error.message}`);
             
             // Fallback if JSON parsing fails
             return {
@@ -173,7 +157,7 @@ Respond ONLY with valid JSON in this exact format:
             // Extract images from response (matching official docs)
             for (const part of response.candidates[0].content.parts) {
                 if (part.text) {
-                    console.log(`Image generation note: ${part.text}`);
+                    log.debug(`Image generation note: ${part.text}`);
                 } else if (part.inlineData) {
                     const imageData = part.inlineData.data;
                     const mimeType = part.inlineData.mimeType || 'image/png';
@@ -189,7 +173,7 @@ Respond ONLY with valid JSON in this exact format:
                 throw new Error('No images were generated. The model may have blocked the request due to safety filters.');
             }
 
-            console.log(`✓ Generated ${images.length} image(s) using Nano Banana (gemini-2.5-flash-image)`);
+            log.info(`✓ Generated ${images.length} image(s) using Nano Banana (gemini-2.5-flash-image)`);
 
             return {
                 success: true,
@@ -198,10 +182,7 @@ Respond ONLY with valid JSON in this exact format:
             };
 
         } catch (error) {
-            console.error(`=`.repeat(60));
-            console.error(`Nano Banana image generation error: ${error.message}`);
-            console.error(`Error type: ${error.constructor.name}`);
-            console.error(`=`.repeat(60));
+            log.error(`Nano Banana image generation error (${error.constructor.name}): ${error.message}`);
             
             return {
                 success: false,
@@ -212,10 +193,15 @@ Respond ONLY with valid JSON in this exact format:
     }
 }
 
-// Singleton getter function
+// Singleton instance
+let geminiService = null;
+
 export function getGeminiService() {
-    const settings = getSettings();
-    return new GeminiService(settings.googleApiKey);
+    if (!geminiService) {
+        const settings = getSettings();
+        geminiService = new GeminiService(settings.googleApiKey);
+    }
+    return geminiService;
 }
 
 export default GeminiService;
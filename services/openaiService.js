@@ -1,7 +1,210 @@
-import OpenAI from 'openai';
-import { GoogleGenerativeAI } from '@google/generative-ai';
+import { createHash } from 'crypto';
+import { setTimeout as sleep } from 'timers/promises';
+import OpenAI, { toFile } from 'openai';
+import { GoogleGenAI } from '@google/genai';
 import Groq from 'groq-sdk';
 import { getSettings } from '../config/index.js';
+import { httpAgent } from '../utils/httpAgent.js';
+import { parseModelJson } from '../utils/json.js';
+import { createLogger } from '../utils/logger.js';
+import { SemanticCache } from '../utils/semanticCache.js';
+import { LRUCache } from '../utils/lruCache.js';
+import { Semaphore, RateLimiter } from '../utils/concurrency.js';
+
+const log = createLogger('openai');
+
+const EMBEDDING_MODEL = 'text-embedding-3-small';
+const EMBEDDING_CACHE_SIZE = 4096;
+// Max inputs per embeddings request (OpenAI limit)
+const EMBEDDING_BATCH_SIZE = 2048;
+
+// Max in-flight generation calls per provider
+const PROVIDER_CONCURRENCY = { openai: 20, gemini: 10, groq: 30 };
+
+// Live generations a batch fallback may run at once, so one fallen-back batch
+// can't take every provider slot from interactive requests
+const BATCH_FALLBACK_CONCURRENCY = 4;
+// How long finished batch results stay pollable, and the hard limit on how
+// long any batch is tracked (24h completion window plus slack)
+const BATCH_RESULT_TTL_MS = 60 * 60 * 1000;
+const BATCH_MAX_AGE_MS = 48 * 60 * 60 * 1000;
+
+// Per-platform writing constraints, shared read-only across requests
+const PLATFORM_CONTEXTS = Object.freeze({
+    instagram: Object.freeze({
+        charLimit: 2200,
+        hashtagLimit: 30,
+        bestPractices: 'Use emojis, line breaks, and storytelling. End with a CTA.'
+    }),
+    linkedin: Object.freeze({
+        charLimit: 3000,
+        hashtagLimit: 5,
+        bestPractices: 'Professional tone, use bullet points, share insights and value.'
+    }),
+    twitter: Object.freeze({
+        charLimit: 280,
+        hashtagLimit: 3,
+        bestPractices: 'Be concise, use hooks, create threads for longer content.'
+    }),
+    facebook: Object.freeze({
+        charLimit: 63206,
+        hashtagLimit: 10,
+        bestPractices: 'Tell stories, ask questions, encourage engagement.'
+    }),
+    tiktok: Object.freeze({
+        charLimit: 2200,
+        hashtagLimit: 10,
+        bestPractices: 'Trendy, casual, use popular hashtags and hooks.'
+    }),
+    youtube: Object.freeze({
+        charLimit: 5000,
+        hashtagLimit: 15,
+        bestPractices: 'SEO-optimized descriptions, include timestamps and links.'
+    })
+});
+
+// Output format for each content kind. The JSON schema is enforced through
+// OpenAI structured outputs, and a converted copy through Gemini's
+// responseSchema. Groq gets the `example` shape written into its prompt instead.
+function jsonObject(properties) {
+    return { type: 'object', properties, required: Object.keys(properties), additionalProperties: false };
+}
+
+// JSON schema -> the OpenAPI subset gemini-1.5-flash accepts as responseSchema
+// (upper-case types, no additionalProperties)
+function toGeminiSchema(schema) {
+    const converted = { type: schema.type.toUpperCase() };
+    if (schema.description) {
+        converted.description = schema.description;
+    }
+    if (schema.items) {
+        converted.items = toGeminiSchema(schema.items);
+    }
+    if (schema.properties) {
+        converted.properties = Object.fromEntries(
+            Object.entries(schema.properties).map(([key, value]) => [key, toGeminiSchema(value)])
+        );
+        converted.required = schema.required;
+    }
+    return converted;
+}
+
+function outputFormat({ name, schema, example }) {
+    return Object.freeze({ name, schema, geminiSchema: toGeminiSchema(schema), example });
+}
+
+const HASHTAGS_FIELD = { type: 'array', items: { type: 'string' }, description: 'Hashtags, each starting with #' };
+
+const TEXT_POST_FORMAT = outputFormat({
+    name: 'text_post',
+    schema: jsonObject({
+        caption: { type: 'string', description: 'The main caption text' },
+        hashtags: HASHTAGS_FIELD,
+        cta: { type: 'string', description: 'Call to action text' }
+    }),
+    example: `{
+    "caption": "The main caption text",
+    "hashtags": ["#hashtag1", "#hashtag2"],
+    "cta": "Call to action text"
+}`
+});
+
+const IMAGE_POST_FORMAT = outputFormat({
+    name: 'image_post',
+    schema: jsonObject({
+        caption: { type: 'string', description: 'The caption text' },
+        hashtags: HASHTAGS_FIELD,
+        cta: { type: 'string', description: 'Call to action' },
+        imagePrompt: { type: 'string', description: 'Detailed prompt for AI image generation' }
+    }),
+    example: `{
+    "caption": "The caption text",
+    "hashtags": ["#hashtag1", "#hashtag2"],
+    "cta": "Call to action",
+    "imagePrompt": "Detailed prompt for AI image generation"
+}`
+});
+
+const VIDEO_SCRIPT_FORMAT = outputFormat({
+    name: 'video_script',
+    schema: jsonObject({
+        hook: { type: 'string', description: 'Attention-grabbing opening line' },
+        script: { type: 'string', description: 'Main video script content' },
+        cta: { type: 'string', description: 'Call to action at the end' },
+        hashtags: HASHTAGS_FIELD
+    }),
+    example: `{
+    "hook": "Attention-grabbing opening line",
+    "script": "Main video script content",
+    "cta": "Call to action at the end",
+    "hashtags": ["#hashtag1", "#hashtag2"]
+}`
+});
+
+// System prompts open with a fixed preamble shared by every request of that
+// kind (text and image posts share one), and only then list the per-request
+// fields. Keeping the static text first lets provider-side prompt caching
+// match the longest prefix.
+const SOCIAL_POST_PREAMBLE = 'You are an expert social media content creator.';
+const VIDEO_SCRIPT_PREAMBLE = 'You are an expert video content creator.';
+
+function textPostSystemPrompt(request, platformCtx) {
+    return `${SOCIAL_POST_PREAMBLE}
+
+Create engaging content for ${request.platform}.
+
+Platform Guidelines:
+- Character limit: ${platformCtx.charLimit}
+- Hashtag limit: ${platformCtx.hashtagLimit}
+- Best practices: ${platformCtx.bestPractices}
+
+Content Requirements:
+- Tone: ${request.tone}
+- Goal: ${request.goal}
+- Include emojis: ${request.includeEmojis}
+- Generate hashtags: ${request.includeHashtags}
+- Include CTA: ${request.includeCTA}`;
+}
+
+function imagePostSystemPrompt(request) {
+    return `${SOCIAL_POST_PREAMBLE}
+
+Create engaging content for ${request.platform} with an image.`;
+}
+
+function videoScriptSystemPrompt(request) {
+    return `${VIDEO_SCRIPT_PREAMBLE}
+
+Create a ${request.duration} video script for ${request.platform}.`;
+}
+
+// Counts words in a single scan over the string. It avoids the throwaway
+// array from split(), and runs of spaces or newlines count as one break.
+function countWords(text) {
+    let words = 0;
+    let inWord = false;
+    for (let i = 0; i < text.length; i++) {
+        // space, \t, \n, \v, \f, \r
+        const code = text.charCodeAt(i);
+        const isSpace = code === 32 || (code >= 9 && code <= 13);
+        if (!isSpace && !inWord) {
+            words++;
+        }
+        inWord = !isSpace;
+    }
+    return words;
+}
+
+// `stats` block shared by text, image and video responses
+function contentStats(text, engagementScore) {
+    const words = countWords(text);
+    return {
+        characters: text.length,
+        words,
+        readTime: `${Math.max(1, Math.floor(words / 3))} sec`,
+        engagementScore
+    };
+}
 
 class OpenAIService {
     constructor() {
@@ -13,103 +216,148 @@ class OpenAIService {
         // Initialize OpenAI
         if (settings.openaiApiKey) {
             try {
-                this.openaiClient = new OpenAI({ apiKey: settings.openaiApiKey });
-                console.log('✓ OpenAI client initialized');
+                this.openaiClient = new OpenAI({ apiKey: settings.openaiApiKey, httpAgent });
+                log.info('✓ OpenAI client initialized');
             } catch (e) {
-                console.error(`✗ OpenAI init failed: ${e.message}`);
+                log.error(`✗ OpenAI init failed: ${e.message}`);
             }
         }
 
         // Initialize Gemini
         if (settings.googleApiKey) {
             try {
-                this.geminiClient = new GoogleGenerativeAI(settings.googleApiKey);
-                console.log('✓ Gemini client initialized');
+                this.geminiClient = new GoogleGenAI({ apiKey: settings.googleApiKey });
+                log.info('✓ Gemini client initialized');
             } catch (e) {
-                console.error(`✗ Gemini init failed: ${e.message}`);
+                log.error(`✗ Gemini init failed: ${e.message}`);
             }
         }
 
         // Initialize Groq
         if (settings.groqApiKey) {
             try {
-                this.groqClient = new Groq({ apiKey: settings.groqApiKey });
-                console.log('✓ Groq client initialized');
+                this.groqClient = new Groq({ apiKey: settings.groqApiKey, httpAgent });
+                log.info('✓ Groq client initialized');
             } catch (e) {
-                console.error(`✗ Groq init failed: ${e.message}`);
+                log.error(`✗ Groq init failed: ${e.message}`);
             }
         }
+
+        // Per-provider throttling: bounded concurrency plus an optional requests-per-minute cap
+        this.semaphores = {};
+        this.rateLimiters = {};
+        for (const [provider, limit] of Object.entries(PROVIDER_CONCURRENCY)) {
+            this.semaphores[provider] = new Semaphore(limit);
+            const rpm = settings.providerRpm[provider];
+            this.rateLimiters[provider] = rpm > 0 ? new RateLimiter(rpm, 60000) : null;
+        }
+
+        // Sampling temperature; 0 when deterministic (reproducible, cache-safe) output is requested
+        this.temperature = settings.deterministicGeneration ? 0 : 0.8;
+
+        // Submitted Batch API jobs: batchId -> { userId, requests, submittedAt,
+        // collecting, collected, results, delivered }
+        this.pendingBatches = new Map();
+        this.batchFallbackMs = settings.batchFallbackMinutes * 60 * 1000;
+        this.batchFallbackLimit = new Semaphore(BATCH_FALLBACK_CONCURRENCY);
+
+        // Hedged generation: race providers instead of falling back one by one
+        this.hedgeProviders = settings.hedgeProviders;
+        this.hedgeDelayMs = settings.hedgeDelayMs;
+
+        // Exact-match response cache, keyed by a hash of the full prompt pair.
+        // Only with deterministic generation: at temperature 0.8 a repeated
+        // prompt (e.g. "regenerate") is expected to give a different post.
+        this.responseCache = settings.deterministicGeneration ? new LRUCache({ maxSize: 1000 }) : null;
+        this.cacheStats = { hits: 0, misses: 0 };
+
+        // Semantic response cache (embeddings come from OpenAI)
+        this.semanticCache = null;
+        if (settings.semanticCacheEnabled && this.openaiClient) {
+            this.semanticCache = new SemanticCache({ threshold: settings.semanticCacheThreshold });
+            log.info(`✓ Semantic cache enabled (threshold ${settings.semanticCacheThreshold})`);
+        }
+
+        // Embeddings by exact input text; topics repeat often across requests
+        this.embeddingCache = new LRUCache({ maxSize: EMBEDDING_CACHE_SIZE });
     }
 
-    _getPlatformContext(platform) {
-        const platforms = {
-            instagram: {
-                charLimit: 2200,
-                hashtagLimit: 30,
-                bestPractices: 'Use emojis, line breaks, and storytelling. End with a CTA.'
-            },
-            linkedin: {
-                charLimit: 3000,
-                hashtagLimit: 5,
-                bestPractices: 'Professional tone, use bullet points, share insights and value.'
-            },
-            twitter: {
-                charLimit: 280,
-                hashtagLimit: 3,
-                bestPractices: 'Be concise, use hooks, create threads for longer content.'
-            },
-            facebook: {
-                charLimit: 63206,
-                hashtagLimit: 10,
-                bestPractices: 'Tell stories, ask questions, encourage engagement.'
-            },
-            tiktok: {
-                charLimit: 2200,
-                hashtagLimit: 10,
-                bestPractices: 'Trendy, casual, use popular hashtags and hooks.'
-            },
-            youtube: {
-                charLimit: 5000,
-                hashtagLimit: 15,
-                bestPractices: 'SEO-optimized descriptions, include timestamps and links.'
+    // Open connections to the configured providers (DNS, TLS) before the
+    // first real request. A cheap model-list call per client; failures only
+    // mean the first request connects on demand as before.
+    async warmUp() {
+        const calls = [
+            this.openaiClient && ['openai', () => this.openaiClient.models.list()],
+            this.geminiClient && ['gemini', () => this.geminiClient.models.list()],
+            this.groqClient && ['groq', () => this.groqClient.models.list()]
+        ].filter(Boolean);
+
+        const results = await Promise.allSettled(calls.map(([, call]) => call()));
+        results.forEach((result, i) => {
+            if (result.status === 'rejected') {
+                log.warn(`${calls[i][0]} warm-up failed: ${result.reason?.message}`);
             }
-        };
-        return platforms[platform] || platforms.instagram;
+        });
     }
 
-    async _generateWithOpenAI(systemPrompt, userPrompt) {
-        const response = await this.openaiClient.chat.completions.create({
+    _getPlatformContext(platform) {
+        return PLATFORM_CONTEXTS[platform] || PLATFORM_CONTEXTS.instagram;
+    }
+
+    // Chat completion request body, shared by live and batch generation.
+    // `format` is one of the *_FORMAT constants; strict structured outputs
+    // guarantee the reply matches its schema.
+    // `promptCacheKey` routes requests with the same prompt prefix to the same
+    // OpenAI cache shard, which raises the cached-token hit rate.
+    _openAIChatBody(systemPrompt, userPrompt, format, promptCacheKey = null) {
+        const body = {
             model: 'gpt-4o-mini',
             messages: [
                 { role: 'system', content: systemPrompt },
                 { role: 'user', content: userPrompt }
             ],
-            temperature: 0.8,
+            temperature: this.temperature,
             max_tokens: 1000,
-            response_format: { type: 'json_object' }
-        });
+            response_format: {
+                type: 'json_schema',
+                json_schema: { name: format.name, schema: format.schema, strict: true }
+            }
+        };
+        if (promptCacheKey) {
+            body.prompt_cache_key = promptCacheKey;
+        }
+        return body;
+    }
+
+    async _generateWithOpenAI(systemPrompt, userPrompt, format, promptCacheKey = null, signal = undefined) {
+        const response = await this.openaiClient.chat.completions.create(
+            this._openAIChatBody(systemPrompt, userPrompt, format, promptCacheKey),
+            { signal }
+        );
 
         return JSON.parse(response.choices[0].message.content);
     }
 
-    async _generateWithGemini(systemPrompt, userPrompt) {
+    async _generateWithGemini(systemPrompt, userPrompt, format, signal = undefined) {
         const fullPrompt = `${systemPrompt}\n\n${userPrompt}`;
-        const model = this.geminiClient.getGenerativeModel({
+        const response = await this.geminiClient.models.generateContent({
             model: 'gemini-1.5-flash',
-            generationConfig: {
-                temperature: 0.8,
+            contents: fullPrompt,
+            config: {
+                temperature: this.temperature,
                 maxOutputTokens: 1000,
-                responseMimeType: 'application/json'
+                responseMimeType: 'application/json',
+                responseSchema: format.geminiSchema,
+                abortSignal: signal
             }
         });
 
-        const result = await model.generateContent(fullPrompt);
-        const text = result.response.text().trim();
-        return this._cleanJsonResponse(text);
+        return parseModelJson(response.text || '');
     }
 
-    async _generateWithGroq(systemPrompt, userPrompt) {
-        const fullSystem = systemPrompt + '\n\nIMPORTANT: Respond ONLY with valid JSON. No markdown, no code blocks, no extra text.';
+    async _generateWithGroq(systemPrompt, userPrompt, format, signal = undefined) {
+        const fullSystem = `${systemPrompt}\n\nRespond with valid JSON:\n${format.example}` +
+            '\n\nIMPORTANT: Respond ONLY with valid JSON. No markdown, no code blocks, no extra text.';
 
         const response = await this.groqClient.chat.completions.create({
             model: 'llama-3.1-8b-instant',
@@ -117,38 +365,154 @@ class OpenAIService {
                 { role: 'system', content: fullSystem },
                 { role: 'user', content: userPrompt }
             ],
-            temperature: 0.8,
+            temperature: this.temperature,
             max_tokens: 1024,
             response_format: { type: 'json_object' }
-        });
+        }, { signal });
+
+        return parseModelJson(response.choices[0].message.content);
+    }
 
-        const text = response.choices[0].message.content.trim();
-        return this._cleanJsonResponse(text);
+    // Stores the pending promise so concurrent lookups of the same text share
+    // one API call; failed calls are evicted so they can be retried.
+    _embed(text) {
+        let pending = this.embeddingCache.get(text);
+        if (!pending) {
+            pending = this.openaiClient.embeddings.create({
+                model: EMBEDDING_MODEL,
+                input: text
+            }).then(response => Float32Array.from(response.data[0].embedding));
+            pending.catch(() => this.embeddingCache.delete(text));
+            this.embeddingCache.set(text, pending);
+        }
+        return pending;
+    }
+
+    // Embed many texts with one request per EMBEDDING_BATCH_SIZE inputs
+    // instead of one per text. Results are returned in input order and also
+    // stored in the embedding cache.
+    async _embedBatch(texts) {
+        const vectors = [];
+        for (let start = 0; start < texts.length; start += EMBEDDING_BATCH_SIZE) {
+            const chunk = texts.slice(start, start + EMBEDDING_BATCH_SIZE);
+            const response = await this.openaiClient.embeddings.create({
+                model: EMBEDDING_MODEL,
+                input: chunk
+            });
+            for (const item of response.data) {
+                vectors[start + item.index] = Float32Array.from(item.embedding);
+            }
+        }
+
+        texts.forEach((text, i) => this.embeddingCache.set(text, Promise.resolve(vectors[i])));
+        return vectors;
     }
 
-    _cleanJsonResponse(text) {
-        // Remove markdown code blocks if present
-        let cleaned = text;
-        if (cleaned.startsWith('```json')) {
-            cleaned = cleaned.substring(7);
+    // Add already generated responses to the semantic cache.
+    // `entries` is a list of { partition, text, response }.
+    async _seedSemanticCache(entries) {
+        if (!this.semanticCache || entries.length === 0) {
+            return;
         }
-        if (cleaned.startsWith('```')) {
-            cleaned = cleaned.substring(3);
+
+        try {
+            const embeddings = await this._embedBatch(entries.map(entry => entry.text));
+            entries.forEach((entry, i) => {
+                this.semanticCache.add(entry.partition, embeddings[i], entry.response);
+            });
+        } catch (e) {
+            log.error(`Semantic cache seeding failed: ${e.message}`);
+        }
+    }
+
+    /**
+     * Generate JSON content, reusing a cached response for identical prompts
+     * (exact-match LRU, deterministic mode only) or near-duplicate ones
+     * (semantic cache).
+     * `format` is the expected output (one of the *_FORMAT constants).
+     * `cacheKey` is `{ partition, text }`: the partition holds every prompt input
+     * except the free-form topic, and `text` (the topic) is what gets embedded.
+     * Embedding the whole prompt would make unrelated topics look similar,
+     * since the shared instructions dominate the vector.
+     */
+    async _generateContent(systemPrompt, userPrompt, format, cacheKey = null) {
+        if (!this.responseCache) {
+            return this._generateWithSemanticCache(systemPrompt, userPrompt, format, cacheKey);
         }
-        if (cleaned.endsWith('```')) {
-            cleaned = cleaned.substring(0, cleaned.length - 3);
+
+        // Identical prompts are answered from the exact-match cache first.
+        // The prompts are hashed directly, with no intermediate JSON string.
+        // Prefixing the system prompt's length keeps the split unambiguous
+        // even though prompts contain free text (topic, video duration).
+        const promptHash = createHash('sha256')
+            .update(`${systemPrompt.length}:`)
+            .update(systemPrompt)
+            .update(userPrompt)
+            .digest('hex');
+
+        const cached = this.responseCache.get(promptHash);
+        if (cached) {
+            this.cacheStats.hits++;
+            log.debug('⚡ Exact cache hit');
+            return cached;
         }
-        return JSON.parse(cleaned.trim());
+        this.cacheStats.misses++;
+
+        const result = await this._generateWithSemanticCache(systemPrompt, userPrompt, format, cacheKey);
+        this.responseCache.set(promptHash, result);
+        return result;
+    }
+
+    async _generateWithSemanticCache(systemPrompt, userPrompt, format, cacheKey) {
+        const promptCacheKey = cacheKey?.partition || null;
+        if (!cacheKey || !this.semanticCache) {
+            return this._generateFromProviders(systemPrompt, userPrompt, format, promptCacheKey);
+        }
+
+        let embedding = null;
+        try {
+            embedding = await this._embed(cacheKey.text);
+            const cached = this.semanticCache.lookup(cacheKey.partition, embedding);
+            if (cached) {
+                log.debug(`⚡ Semantic cache hit (${cacheKey.partition})`);
+                return cached;
+            }
+        } catch (e) {
+            log.error(`Semantic cache lookup failed: ${e.message}`);
+        }
+
+        const result = await this._generateFromProviders(systemPrompt, userPrompt, format, promptCacheKey);
+        if (embedding) {
+            this.semanticCache.add(cacheKey.partition, embedding, result);
+        }
+        return result;
+    }
+
+    // Run a provider call within that provider's concurrency and rate limits.
+    // The rate-limit slot is taken only once a concurrency slot is held, so a
+    // call aborted via `signal` while queued never uses up the provider's RPM.
+    async _withProviderLimit(provider, call, signal) {
+        return this.semaphores[provider].run(async () => {
+            signal?.throwIfAborted();
+            if (this.rateLimiters[provider]) {
+                await this.rateLimiters[provider].wait(signal);
+            }
+            return call();
+        });
     }
 
-    async _generateContent(systemPrompt, userPrompt) {
+    async _generateFromProviders(systemPrompt, userPrompt, format, promptCacheKey = null) {
+        if (this.hedgeProviders) {
+            return this._raceProviders(systemPrompt, userPrompt, format, promptCacheKey);
+        }
+
         // Try OpenAI first
         if (this.openaiClient) {
             try {
-                console.log('🤖 Trying OpenAI...');
-                return await this._generateWithOpenAI(systemPrompt, userPrompt);
+                log.debug('🤖 Trying OpenAI...');
+                return await this._withProviderLimit('openai', () => this._generateWithOpenAI(systemPrompt, userPrompt, format, promptCacheKey));
             } catch (e) {
-                console.error(`OpenAI failed: ${e.message}`);
+                log.warn(`OpenAI failed: ${e.message}`);
             }
         }
 
@@ -156,13 +520,13 @@ class OpenAIService {
         if (this.geminiClient) {
             for (let attempt = 0; attempt < 2; attempt++) {
                 try {
-                    console.log(`🤖 Using Gemini (attempt ${attempt + 1}/2)...`);
+                    log.debug(`🤖 Using Gemini (attempt ${attempt + 1}/2)...`);
                     if (attempt > 0) {
                         await new Promise(resolve => setTimeout(resolve, 2000));
                     }
-                    return await this._generateWithGemini(systemPrompt, userPrompt);
+                    return await this._withProviderLimit('gemini', () => this._generateWithGemini(systemPrompt, userPrompt, format));
                 } catch (e) {
-                    console.error(`Gemini attempt ${attempt + 1} failed: ${e.message}`);
+                    log.warn(`Gemini attempt ${attempt + 1} failed: ${e.message}`);
                 }
             }
         }
@@ -171,13 +535,13 @@ class OpenAIService {
         if (this.groqClient) {
             for (let attempt = 0; attempt < 2; attempt++) {
                 try {
-                    console.log(`🤖 Using Groq (attempt ${attempt + 1}/2)...`);
+                    log.debug(`🤖 Using Groq (attempt ${attempt + 1}/2)...`);
                     if (attempt > 0) {
                         await new Promise(resolve => setTimeout(resolve, 2000));
                     }
-                    return await this._generateWithGroq(systemPrompt, userPrompt);
+                    return await this._withProviderLimit('groq', () => this._generateWithGroq(systemPrompt, userPrompt, format));
                 } catch (e) {
-                    console.error(`Groq attempt ${attempt + 1} failed: ${e.message}`);
+                    log.warn(`Groq attempt ${attempt + 1} failed: ${e.message}`);
                     if (attempt === 1) {
                         throw new Error(`All AI providers failed. Last error: ${e.message}`);
                     }
@@ -188,80 +552,295 @@ class OpenAIService {
         throw new Error('No AI provider available. Configure OpenAI, Google, or Groq API key.');
     }
 
-    async generateTextPost(request) {
-        const platformCtx = this._getPlatformContext(request.platform);
+    /**
+     * Hedged generation. Providers start in fallback order: the Nth one
+     * starts N * hedgeDelayMs after the race begins, or as soon as the
+     * previous one fails. The first success wins and the calls still running are aborted,
+     * so a stalled provider costs roughly one hedge delay rather than its
+     * full timeout.
+     */
+    async _raceProviders(systemPrompt, userPrompt, format, promptCacheKey) {
+        const providers = [
+            this.openaiClient && ['openai', signal => this._generateWithOpenAI(systemPrompt, userPrompt, format, promptCacheKey, signal)],
+            this.geminiClient && ['gemini', signal => this._generateWithGemini(systemPrompt, userPrompt, format, signal)],
+            this.groqClient && ['groq', signal => this._generateWithGroq(systemPrompt, userPrompt, format, signal)]
+        ].filter(Boolean);
+
+        if (providers.length === 0) {
+            throw new Error('No AI provider available. Configure OpenAI, Google, or Groq API key.');
+        }
 
-        const systemPrompt = `You are an expert social media content creator.
-Create engaging content for ${request.platform}.
+        const controller = new AbortController();
+        const { signal } = controller;
+        // Settles only when the previously started provider fails
+        let previousFailed = null;
+
+        const attempts = providers.map(([name, call], index) => {
+            const start = index === 0
+                ? Promise.resolve()
+                : Promise.race([sleep(index * this.hedgeDelayMs, undefined, { signal }), previousFailed]);
+
+            const attempt = start.then(() => {
+                // A starter released by a failure after the race was decided stays idle
+                signal.throwIfAborted();
+                log.debug(`🤖 Racing ${name}...`);
+                return this._withProviderLimit(name, () => call(signal), signal);
+            });
+            attempt.catch(e => {
+                if (!signal.aborted) {
+                    log.warn(`${name} failed: ${e.message}`);
+                }
+            });
 
-Platform Guidelines:
-- Character limit: ${platformCtx.charLimit}
-- Hashtag limit: ${platformCtx.hashtagLimit}
-- Best practices: ${platformCtx.bestPractices}
+            previousFailed = attempt.then(() => new Promise(() => {}), () => undefined);
+            return attempt;
+        });
 
-Content Requirements:
-- Tone: ${request.tone}
-- Goal: ${request.goal}
-- Include emojis: ${request.includeEmojis}
-- Generate hashtags: ${request.includeHashtags}
-- Include CTA: ${request.includeCTA}
+        try {
+            return await Promise.any(attempts);
+        } catch (e) {
+            const lastError = e.errors[e.errors.length - 1];
+            throw new Error(`All AI providers failed. Last error: ${lastError.message}`);
+        } finally {
+            controller.abort();
+        }
+    }
 
-Respond with valid JSON:
-{
-    "caption": "The main caption text",
-    "hashtags": ["#hashtag1", "#hashtag2"],
-    "cta": "Call to action text"
-}`;
+    _buildTextPostPrompts(request) {
+        const { platform, tone, goal, topic } = request;
+        const platformCtx = this._getPlatformContext(platform);
+
+        const systemPrompt = textPostSystemPrompt(request, platformCtx);
 
-        const userPrompt = `Create a ${request.tone} social media post for ${request.platform} about:
+        const userPrompt = `Create a social media post. Make it engaging and optimized for the platform.
 
-${request.topic}
+Platform: ${platform}
+Tone: ${tone}
+Goal: ${goal}
 
-Goal: ${request.goal}. Make it engaging and optimized for the platform.`;
+Topic:
+${topic}`;
 
-        const result = await this._generateContent(systemPrompt, userPrompt);
+        return { systemPrompt, userPrompt };
+    }
 
+    // Every text prompt input except the topic; used as the cache partition
+    _textPostPartition(request) {
+        return `text:${request.platform}:${request.tone}:${request.goal}:${request.includeHashtags}:${request.includeCTA}:${request.includeEmojis}`;
+    }
+
+    _formatTextPost(request, result) {
         const caption = result.caption || '';
-        const words = caption.split(' ').length;
 
         return {
             success: true,
             caption,
             hashtags: request.includeHashtags ? (result.hashtags || []) : [],
             cta: request.includeCTA ? (result.cta || '') : '',
-            stats: {
-                characters: caption.length,
-                words,
-                readTime: `${Math.max(1, Math.floor(words / 3))} sec`,
-                engagementScore: (result.hashtags?.length >= 5) ? 'High' : 'Medium'
-            },
+            stats: contentStats(caption, (result.hashtags?.length >= 5) ? 'High' : 'Medium'),
             creditsUsed: 1,
             creditsRemaining: 149
         };
     }
 
-    async generateImagePost(request) {
-        const systemPrompt = `You are an expert social media content creator.
-Create engaging content for ${request.platform} with an image.
+    async generateTextPost(request) {
+        const { systemPrompt, userPrompt } = this._buildTextPostPrompts(request);
 
-Respond with valid JSON:
-{
-    "caption": "The caption text",
-    "hashtags": ["#hashtag1", "#hashtag2"],
-    "cta": "Call to action",
-    "imagePrompt": "Detailed prompt for AI image generation"
-}`;
+        const result = await this._generateContent(systemPrompt, userPrompt, TEXT_POST_FORMAT, {
+            partition: this._textPostPartition(request),
+            text: request.topic
+        });
 
-        const userPrompt = `Create a ${request.tone} image post for ${request.platform} about:
+        return this._formatTextPost(request, result);
+    }
 
-${request.topic}
+    /**
+     * Submit text posts to the OpenAI Batch API (about half the token cost,
+     * results within the 24h completion window). Poll with pollBatch() using
+     * the same `userId`.
+     */
+    async submitTextPostBatch(requests, userId = null) {
+        if (!this.openaiClient) {
+            throw new Error('Batch generation requires an OpenAI API key.');
+        }
 
-Goal: ${request.goal}. Include a detailed image generation prompt.`;
+        const lines = requests.map((request, index) => {
+            const { systemPrompt, userPrompt } = this._buildTextPostPrompts(request);
+            return JSON.stringify({
+                custom_id: `text-${index}`,
+                method: 'POST',
+                url: '/v1/chat/completions',
+                body: this._openAIChatBody(systemPrompt, userPrompt, TEXT_POST_FORMAT, this._textPostPartition(request))
+            });
+        });
 
-        const result = await this._generateContent(systemPrompt, userPrompt);
+        const inputFile = await this.openaiClient.files.create({
+            file: await toFile(Buffer.from(lines.join('\n')), 'text-posts.jsonl'),
+            purpose: 'batch'
+        });
+
+        const batch = await this.openaiClient.batches.create({
+            input_file_id: inputFile.id,
+            endpoint: '/v1/chat/completions',
+            completion_window: '24h'
+        });
+
+        this.pendingBatches.set(batch.id, {
+            userId,
+            requests,
+            submittedAt: Date.now(),
+            collecting: null,
+            collected: new Array(requests.length).fill(null),
+            results: null,
+            delivered: false
+        });
+        setTimeout(() => this.pendingBatches.delete(batch.id), BATCH_MAX_AGE_MS).unref();
+        log.info(`📦 Submitted batch ${batch.id} (${requests.length} text posts)`);
+
+        return { batchId: batch.id, status: batch.status };
+    }
+
+    /**
+     * Check a submitted batch. Returns null for unknown ids and for batches
+     * submitted by a different user (batches are tracked in memory).
+     *
+     * Once the batch finishes, its results are collected in the background:
+     * the output file is read, and posts the batch didn't produce are
+     * generated directly. That also happens if the batch fails, or is still
+     * running after the fallback window (it is cancelled first). Later polls
+     * then return one formatted post per submitted request, in order.
+     * `newlyCompleted` is true on exactly one of those polls.
+     */
+    async pollBatch(batchId, userId = null) {
+        const entry = this.pendingBatches.get(batchId);
+        if (!entry || entry.userId !== userId) {
+            return null;
+        }
+
+        if (!entry.results && !entry.collecting) {
+            const batch = await this.openaiClient.batches.retrieve(batchId);
+
+            // Another poll may have started collecting while this one waited
+            if (!entry.results && !entry.collecting) {
+                if (!this._batchReady(batchId, entry, batch)) {
+                    return { batchId, status: batch.status, userId, requests: entry.requests, results: null, newlyCompleted: false };
+                }
+                entry.collecting = this._collectBatch(batchId, entry, batch)
+                    .catch(e => log.error(`Collecting batch ${batchId} failed, will retry on next poll: ${e.message}`))
+                    .finally(() => { entry.collecting = null; });
+            }
+        }
+
+        if (!entry.results) {
+            return { batchId, status: 'collecting', userId, requests: entry.requests, results: null, newlyCompleted: false };
+        }
+
+        const newlyCompleted = !entry.delivered;
+        entry.delivered = true;
+        return { batchId, status: 'completed', userId, requests: entry.requests, results: entry.results, newlyCompleted };
+    }
+
+    // Whether the batch's results should be collected now
+    _batchReady(batchId, entry, batch) {
+        if (batch.status === 'completed') {
+            return true;
+        }
+        if (['failed', 'expired', 'cancelled'].includes(batch.status)) {
+            log.warn(`Batch ${batchId} ${batch.status}, generating directly`);
+            return true;
+        }
+        if (Date.now() - entry.submittedAt > this.batchFallbackMs) {
+            log.warn(`Batch ${batchId} still ${batch.status} after fallback window, cancelling`);
+            return true;
+        }
+        return false;
+    }
+
+    // Gather a batch's posts into entry.results. Posts missing from the output
+    // are generated live, a few at a time; posts already collected by an
+    // earlier failed attempt are kept.
+    async _collectBatch(batchId, entry, batch) {
+        let outputs = new Map();
+        if (batch.status === 'completed') {
+            if (batch.output_file_id) {
+                outputs = await this._readBatchOutput(batch.output_file_id);
+            }
+        } else if (!['failed', 'expired', 'cancelled'].includes(batch.status)) {
+            try {
+                await this.openaiClient.batches.cancel(batchId);
+            } catch (e) {
+                log.error(`Failed to cancel batch ${batchId}: ${e.message}`);
+            }
+        }
+
+        // Wait for every fallback, even after one fails: `collecting` must stay
+        // set until no generation is still running, or the next poll would
+        // start (and pay for) the same posts again. Finished posts are kept.
+        const settled = await Promise.allSettled(entry.requests.map(async (request, index) => {
+            if (entry.collected[index]) {
+                return;
+            }
+            const output = outputs.get(`text-${index}`);
+            entry.collected[index] = output
+                ? this._formatTextPost(request, output)
+                : await this.batchFallbackLimit.run(() => this.generateTextPost(request));
+        }));
+        const failed = settled.filter(({ status }) => status === 'rejected');
+        if (failed.length > 0) {
+            throw new Error(`${failed.length} of ${settled.length} batch post(s) failed: ${failed[0].reason.message}`);
+        }
+
+        // Batch outputs skipped the live path, so they aren't in the semantic cache yet
+        await this._seedSemanticCache(entry.requests.flatMap((request, index) => {
+            const output = outputs.get(`text-${index}`);
+            return output ? [{ partition: this._textPostPartition(request), text: request.topic, response: output }] : [];
+        }));
+
+        entry.results = entry.collected;
+        setTimeout(() => this.pendingBatches.delete(batchId), BATCH_RESULT_TTL_MS).unref();
+        log.info(`📦 Batch ${batchId} collected (${entry.results.length} text posts)`);
+    }
+
+    // Parse a batch output file into a Map of custom_id -> generated JSON
+    async _readBatchOutput(fileId) {
+        const response = await this.openaiClient.files.content(fileId);
+        const outputs = new Map();
+
+        for (const line of (await response.text()).split('\n')) {
+            if (!line.trim()) continue;
+            try {
+                const record = JSON.parse(line);
+                const content = record.response?.body?.choices?.[0]?.message?.content;
+                if (content) {
+                    outputs.set(record.custom_id, JSON.parse(content));
+                }
+            } catch (e) {
+                log.error(`Skipping unreadable batch output line: ${e.message}`);
+            }
+        }
+
+        return outputs;
+    }
+
+    async generateImagePost(request) {
+        const { platform, tone, goal, topic } = request;
+        const systemPrompt = imagePostSystemPrompt(request);
+
+        const userPrompt = `Create an image post. Include a detailed image generation prompt.
+
+Platform: ${platform}
+Tone: ${tone}
+Goal: ${goal}
+
+Topic:
+${topic}`;
+
+        const result = await this._generateContent(systemPrompt, userPrompt, IMAGE_POST_FORMAT, {
+            partition: `image:${platform}:${tone}:${goal}`,
+            text: topic
+        });
 
         const caption = result.caption || '';
-        const words = caption.split(' ').length;
 
         return {
             success: true,
@@ -269,40 +848,33 @@ Goal: ${request.goal}. Include a detailed image generation prompt.`;
             hashtags: result.hashtags || [],
             cta: result.cta || '',
             imagePrompt: result.imagePrompt || '',
-            stats: {
-                characters: caption.length,
-                words,
-                readTime: `${Math.max(1, Math.floor(words / 3))} sec`,
-                engagementScore: 'High'
-            },
+            stats: contentStats(caption, 'High'),
             creditsUsed: 2,
             creditsRemaining: 23
         };
     }
 
     async generateVideoScript(request) {
-        const systemPrompt = `You are an expert video content creator.
-Create a ${request.duration} video script for ${request.platform}.
+        const { platform, tone, goal, topic, duration } = request;
+        const systemPrompt = videoScriptSystemPrompt(request);
 
-Respond with valid JSON:
-{
-    "hook": "Attention-grabbing opening line",
-    "script": "Main video script content",
-    "cta": "Call to action at the end",
-    "hashtags": ["#hashtag1", "#hashtag2"]
-}`;
+        const userPrompt = `Create a video script.
 
-        const userPrompt = `Create a ${request.tone} video script for ${request.platform} about:
+Platform: ${platform}
+Tone: ${tone}
+Goal: ${goal}
+Duration: ${duration}
 
-${request.topic}
+Topic:
+${topic}`;
 
-Duration: ${request.duration}
-Goal: ${request.goal}`;
-
-        const result = await this._generateContent(systemPrompt, userPrompt);
+        const result = await this._generateContent(systemPrompt, userPrompt, VIDEO_SCRIPT_FORMAT, {
+            // duration is trimmed, lower-cased and length-capped by VideoScriptRequest
+            partition: `video:${platform}:${tone}:${goal}:${duration}`,
+            text: topic
+        });
 
         const script = result.script || '';
-        const words = script.split(' ').length;
 
         return {
             success: true,
@@ -310,12 +882,7 @@ Goal: ${request.goal}`;
             script,
             cta: result.cta || '',
             hashtags: result.hashtags || [],
-            stats: {
-                characters: script.length,
-                words,
-                readTime: `${Math.max(1, Math.floor(words / 3))} sec`,
-                engagementScore: 'High'
-            },
+            stats: contentStats(script, 'High'),
             creditsUsed: 3,
             creditsRemaining: 7
         };
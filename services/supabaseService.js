@@ -1,37 +1,137 @@
+import { setTimeout as sleep } from 'timers/promises';
 import { createClient } from '@supabase/supabase-js';
 import { getSettings } from '../config/index.js';
+import { createLogger } from '../utils/logger.js';
+import { LRUCache } from '../utils/lruCache.js';
+import { Semaphore } from '../utils/concurrency.js';
+
+const log = createLogger('supabase');
+
+// content_history rows are buffered and written with one bulk insert
+const INSERT_BATCH_SIZE = 500;
+const INSERT_FLUSH_INTERVAL_MS = 200;
+// A failed bulk insert is retried with a growing delay. If a row's data is
+// rejected, the rows are then written one by one (a few at a time) so only the
+// bad rows are lost; on transport or server errors the batch is dropped.
+const INSERT_MAX_ATTEMPTS = 3;
+const INSERT_RETRY_DELAY_MS = 500;
+const ROW_INSERT_CONCURRENCY = 10;
+
+// Background writes allowed in flight before callers have to wait for theirs
+const MAX_PENDING_WRITES = 1000;
+
+// Credits returned when no stored balance is available; shared, read-only
+const DEFAULT_CREDITS = Object.freeze({ text: 150, image: 25, video: 10, total: 185 });
+
+// Credit balances are cached briefly so dashboard polling doesn't hit the DB every time
+const CREDITS_CACHE_SIZE = 10000;
+const CREDITS_CACHE_TTL_MS = 5000;
+
+// Verified auth tokens are reused for a short window instead of calling
+// Supabase Auth on every request; kept short so revoked sessions lapse quickly,
+// and never past the token's own expiry
+const AUTH_CACHE_SIZE = 10000;
+const AUTH_CACHE_TTL_MS = 30000;
+
+// True for errors caused by the rows themselves (bad values or constraint
+// violations) rather than by the connection or the database being down
+function isRowDataError(error, status) {
+    return /^2[23]/.test(error.code || '') || status === 400 || status === 409;
+}
+
+// Milliseconds until a JWT's `exp` claim, or 0 if it has none or can't be read
+function tokenLifetimeMs(token) {
+    try {
+        const { exp } = JSON.parse(Buffer.from(token.split('.')[1], 'base64url').toString());
+        return typeof exp === 'number' ? Math.max(0, exp * 1000 - Date.now()) : 0;
+    } catch {
+        return 0;
+    }
+}
+
+// user_credits row -> { text, image, video, total }
+function toCredits(row) {
+    const text = row.text_credits;
+    const image = row.image_credits;
+    const video = row.video_credits;
+    return { text, image, video, total: text + image + video };
+}
 
 class SupabaseService {
     constructor() {
         const settings = getSettings();
         this.client = null;
+        this._insertBuffer = [];
+        this._flushTimer = null;
+        this._pendingWrites = new Set();
+        this._creditsCache = new LRUCache({ maxSize: CREDITS_CACHE_SIZE, ttlMs: CREDITS_CACHE_TTL_MS });
+        this._authCache = new LRUCache({ maxSize: AUTH_CACHE_SIZE, ttlMs: AUTH_CACHE_TTL_MS });
 
         if (settings.supabaseUrl && settings.supabaseKey) {
             try {
                 this.client = createClient(settings.supabaseUrl, settings.supabaseKey);
-                console.log('✓ Supabase client initialized');
+                log.info('✓ Supabase client initialized');
             } catch (e) {
-                console.error(`✗ Supabase init failed: ${e.message}`);
+                log.error(`✗ Supabase init failed: ${e.message}`);
             }
         } else {
-            console.warn('⚠️  Supabase not configured - database features disabled');
+            log.warn('⚠️  Supabase not configured - database features disabled');
         }
+
+        // Resolved once; the client is never swapped after construction
+        this._configured = this.client !== null;
     }
 
     isConfigured() {
-        return this.client !== null;
+        return this._configured;
+    }
+
+    /**
+     * Resolve a bearer token to its Supabase user, or null if it is invalid.
+     * The pending lookup is cached, so concurrent requests with the same token
+     * share one Auth call; rejected tokens and failed calls are not cached.
+     * A verified user stays cached until AUTH_CACHE_TTL_MS or the token's
+     * `exp`, whichever comes first.
+     */
+    getUserForToken(token) {
+        let pending = this._authCache.get(token);
+        if (!pending) {
+            pending = this.client.auth.getUser(token).then(({ data, error }) => {
+                if (error || !data.user) {
+                    this._authCache.delete(token);
+                    log.warn(`Auth token verification failed: ${error?.message || 'Invalid token'}`);
+                    return null;
+                }
+
+                const ttlMs = Math.min(AUTH_CACHE_TTL_MS, tokenLifetimeMs(token));
+                if (ttlMs > 0) {
+                    this._authCache.set(token, pending, ttlMs);
+                } else {
+                    this._authCache.delete(token);
+                }
+                return data.user;
+            });
+            pending.catch(() => this._authCache.delete(token));
+            this._authCache.set(token, pending);
+        }
+        return pending;
     }
 
     async getUserCredits(userId) {
         if (!this.isConfigured()) {
             // Return default credits if Supabase not configured
-            return { text: 150, image: 25, video: 10, total: 185 };
+            return DEFAULT_CREDITS;
+        }
+
+        const cached = this._creditsCache.get(userId);
+        if (cached) {
+            return cached;
         }
 
         try {
             const { data, error } = await this.client
                 .from('user_credits')
-                .select('*')
+                .select('text_credits, image_credits, video_credits')
                 .eq('user_id', userId)
                 .single();
 
@@ -39,110 +139,239 @@ class SupabaseService {
                 throw error;
             }
 
+            let credits = DEFAULT_CREDITS;
             if (data) {
-                return data;
+                credits = toCredits(data);
             } else {
                 // Create default credits for new user
-                const defaultCredits = {
-                    user_id: userId,
-                    text: 150,
-                    image: 25,
-                    video: 10
-                };
-
-                await this.client
+                const { error: insertError } = await this.client
                     .from('user_credits')
-                    .insert(defaultCredits);
+                    .insert({
+                        user_id: userId,
+                        text_credits: DEFAULT_CREDITS.text,
+                        image_credits: DEFAULT_CREDITS.image,
+                        video_credits: DEFAULT_CREDITS.video
+                    });
 
-                return { ...defaultCredits, total: 185 };
+                // The defaults are cached either way, so a persistent insert
+                // failure costs one attempt and one log line per cache TTL
+                if (insertError) {
+                    log.warn(`Could not create default credits for ${userId}: ${insertError.message}`);
+                }
             }
+
+            this._creditsCache.set(userId, credits);
+            return credits;
         } catch (e) {
-            console.error(`Supabase error: ${e.message}`);
-            return { text: 150, image: 25, video: 10, total: 185 };
+            log.error(`Supabase error: ${e.message}`);
+            return DEFAULT_CREDITS;
         }
     }
 
+    /**
+     * Spend one credit of `creditType` with the atomic deduct_credit RPC
+     * (migration 007). Resolves to `{ deducted, remaining }`; `remaining` is
+     * null when the balance couldn't be read. Users without a user_credits
+     * row aren't tracked, so like the unconfigured case the deduction is
+     * allowed against the default balance.
+     */
     async deductCredit(userId, creditType) {
         if (!this.isConfigured()) {
-            return true; // Skip credit deduction if not configured
+            // Skip credit deduction if not configured
+            return { deducted: true, remaining: DEFAULT_CREDITS[creditType] };
         }
 
         try {
-            // Get current credits
-            const { data, error } = await this.client
-                .from('user_credits')
-                .select(creditType)
-                .eq('user_id', userId)
-                .single();
+            const { data, error } = await this.client.rpc('deduct_credit', {
+                uid: userId,
+                credit_type: creditType
+            });
 
             if (error) throw error;
 
-            if (data && (data[creditType] || 0) > 0) {
-                const newValue = data[creditType] - 1;
-                await this.client
-                    .from('user_credits')
-                    .update({ [creditType]: newValue })
-                    .eq('user_id', userId);
-                return true;
+            this._creditsCache.delete(userId);
+
+            if (data === -1) {
+                log.warn(`No user_credits row for ${userId}, deduction not recorded`);
+                return { deducted: true, remaining: DEFAULT_CREDITS[creditType] };
             }
-            return false;
+            // NULL means nothing was left to deduct
+            return data === null ? { deducted: false, remaining: 0 } : { deducted: true, remaining: data };
         } catch (e) {
-            console.error(`Supabase error: ${e.message}`);
-            return true; // Allow operation to continue
+            log.error(`Supabase error: ${e.message}`);
+            return { deducted: true, remaining: null }; // Allow operation to continue
         }
     }
 
-    async saveGeneratedContent(userId, content) {
+    /**
+     * Cheap version tag for content_history: row count plus newest created_at.
+     * Changes whenever rows are added or removed; null if it can't be read.
+     */
+    async getContentHistoryVersion(userId = null) {
         if (!this.isConfigured()) {
-            return true;
+            return null;
         }
 
         try {
-            await this.client.from('content_history').insert({
-                user_id: userId,
-                platform: content.platform,
-                content_type: content.contentType,
-                caption: content.caption,
-                hashtags: content.hashtags,
-                cta: content.cta
-            });
-            return true;
+            let query = this.client
+                .from('content_history')
+                .select('created_at', { count: 'exact' })
+                .order('created_at', { ascending: false })
+                .limit(1);
+
+            if (userId) {
+                query = query.eq('user_id', userId);
+            }
+
+            const { data, count, error } = await query;
+
+            if (error) throw error;
+
+            return `${count || 0}-${data?.[0]?.created_at || 'empty'}`;
+        } catch (e) {
+            log.error(`Supabase error: ${e.message}`);
+            return null;
+        }
+    }
+
+    /**
+     * Run a DB write without holding up the response. `write` returns a
+     * Supabase query; its errors are logged under `label`. Pending writes are
+     * tracked so shutdown can drain them. Past MAX_PENDING_WRITES the
+     * returned promise only resolves once this write is done (backpressure).
+     */
+    runInBackground(label, write) {
+        const task = Promise.resolve()
+            .then(write)
+            .then(({ error } = {}) => {
+                if (error) throw error;
+                log.info(`Saved ${label}`);
+            })
+            .catch(e => log.error(`Failed to save ${label}: ${e.message}`))
+            .finally(() => this._pendingWrites.delete(task));
+
+        this._pendingWrites.add(task);
+        return this._pendingWrites.size > MAX_PENDING_WRITES ? task : Promise.resolve();
+    }
+
+    /**
+     * Wait for in-flight background writes, history flushes included, to settle
+     */
+    async drainPendingWrites() {
+        while (this._pendingWrites.size > 0) {
+            await Promise.all(this._pendingWrites);
+        }
+    }
+
+    /**
+     * Queue a content_history row for the next bulk insert.
+     * Flushes immediately once a full batch is buffered, otherwise on a short timer.
+     */
+    queueContentHistory(row) {
+        this._insertBuffer.push(row);
+
+        if (this._insertBuffer.length >= INSERT_BATCH_SIZE) {
+            this.flushContentHistory();
+        } else if (!this._flushTimer) {
+            this._flushTimer = setTimeout(() => this.flushContentHistory(), INSERT_FLUSH_INTERVAL_MS);
+            this._flushTimer.unref();
+        }
+    }
+
+    /**
+     * Write all buffered content_history rows in a single request. The write
+     * (retries included) is tracked with the other background writes, so
+     * drainPendingWrites() waits for it.
+     */
+    flushContentHistory() {
+        if (this._flushTimer) {
+            clearTimeout(this._flushTimer);
+            this._flushTimer = null;
+        }
+
+        const rows = this._insertBuffer.splice(0, this._insertBuffer.length);
+        if (rows.length === 0 || !this.isConfigured()) {
+            return Promise.resolve();
+        }
+
+        const task = this._writeContentRows(rows).finally(() => this._pendingWrites.delete(task));
+        this._pendingWrites.add(task);
+        return task;
+    }
+
+    // Bulk insert with retries; failures are logged, never thrown
+    async _writeContentRows(rows) {
+        let result;
+        for (let attempt = 1; attempt <= INSERT_MAX_ATTEMPTS; attempt++) {
+            result = await this._insertContentRows(rows);
+            if (!result.error) {
+                log.debug(`Flushed ${rows.length} content row(s) to database`);
+                return;
+            }
+            if (isRowDataError(result.error, result.status)) {
+                break;
+            }
+            log.warn(`Bulk insert of ${rows.length} content row(s) failed (attempt ${attempt}/${INSERT_MAX_ATTEMPTS}): ${result.error.message}`);
+            if (attempt < INSERT_MAX_ATTEMPTS) {
+                await sleep(INSERT_RETRY_DELAY_MS * attempt);
+            }
+        }
+
+        if (!isRowDataError(result.error, result.status)) {
+            log.error(`Dropped ${rows.length} content row(s): ${result.error.message}`);
+            return;
+        }
+
+        // A single bad row fails the whole bulk insert, so fall back to row-by-row
+        const limit = new Semaphore(ROW_INSERT_CONCURRENCY);
+        const errors = (await Promise.all(rows.map(row => limit.run(() => this._insertContentRows([row])))))
+            .map(({ error }) => error)
+            .filter(Boolean);
+        if (errors.length > 0) {
+            log.error(`Failed to save ${errors.length} of ${rows.length} content row(s): ${errors[0].message}`);
+        }
+    }
+
+    // Insert content_history rows; resolves to { error, status }, error null on success
+    async _insertContentRows(rows) {
+        try {
+            const { error, status } = await this.client.from('content_history').insert(rows);
+            return { error: error || null, status };
         } catch (e) {
-            console.error(`Supabase error: ${e.message}`);
-            return false;
+            return { error: e, status: 0 };
         }
     }
 
     async uploadImageToStorage(imageBase64, filename, bucket = 'ugc-ads') {
-        console.log(`📤 Starting image upload process...`);
-        console.log(`   Bucket: ${bucket}`);
-        console.log(`   Filename: ${filename}`);
+        log.debug(`📤 Starting image upload process...`);
+        log.debug(`   Bucket: ${bucket}`);
+        log.debug(`   Filename: ${filename}`);
         
         if (!this.isConfigured()) {
             throw new Error('Supabase is not configured');
         }
 
         try {
-            console.log(`   Removing data URI prefix...`);
+            log.debug(`   Removing data URI prefix...`);
             // Remove data URI prefix if present
             let base64Data = imageBase64;
             if (imageBase64.startsWith('data:')) {
                 base64Data = imageBase64.split(',')[1];
             }
 
-            console.log(`   Converting base64 to buffer... (${base64Data.length} characters)`);
+            log.debug(`   Converting base64 to buffer... (${base64Data.length} characters)`);
             // Decode base64 to bytes
             const imageBuffer = Buffer.from(base64Data, 'base64');
-            console.log(`   Buffer created: ${imageBuffer.length} bytes`);
+            log.debug(`   Buffer created: ${imageBuffer.length} bytes`);
 
             // Generate unique filename with timestamp
             const timestamp = new Date().toISOString().replace(/[-:]/g, '').split('.')[0];
             const randomId = Math.random().toString(36).substring(2, 10);
             const uniqueFilename = `${timestamp}_${randomId}_${filename}`;
-            console.log(`   Unique filename: ${uniqueFilename}`);
+            log.debug(`   Unique filename: ${uniqueFilename}`);
 
             // Upload to Supabase Storage
-            console.log(`   Uploading to Supabase storage...`);
+            log.debug(`   Uploading to Supabase storage...`);
             const { data, error } = await this.client.storage
                 .from(bucket)
                 .upload(uniqueFilename, imageBuffer, {
@@ -151,25 +380,23 @@ class SupabaseService {
                 });
 
             if (error) {
-                console.error(`   ❌ Upload error: ${JSON.stringify(error)}`);
+                log.error(`   ❌ Upload error: ${JSON.stringify(error)}`);
                 throw error;
             }
             
-            console.log(`   ✓ Upload successful! Data: ${JSON.stringify(data)}`);
+            log.debug(`   ✓ Upload successful! Data: ${JSON.stringify(data)}`);
 
             // Get public URL
-            console.log(`   Getting public URL...`);
+            log.debug(`   Getting public URL...`);
             const { data: urlData } = this.client.storage
                 .from(bucket)
                 .getPublicUrl(uniqueFilename);
 
-            console.log(`✅ Image uploaded successfully: ${urlData.publicUrl}`);
+            log.info(`✅ Image uploaded successfully: ${urlData.publicUrl}`);
             return urlData.publicUrl;
 
         } catch (e) {
-            console.error(`❌ CRITICAL ERROR in uploadImageToStorage:`);
-            console.error(`   Message: ${e.message}`);
-            console.error(`   Stack: ${e.stack}`);
+            log.error('❌ CRITICAL ERROR in uploadImageToStorage:', e);
             // DON'T return base64 - throw the error so we can see what's wrong!
             throw new Error(`Supabase upload failed: ${e.message}`);
         }
@@ -0,0 +1,70 @@
+// Async concurrency primitives for throttling outbound provider calls
+
+import { setTimeout as sleep } from 'timers/promises';
+
+/**
+ * Counting semaphore: at most `limit` tasks run at once, the rest wait in FIFO order
+ */
+export class Semaphore {
+    constructor(limit) {
+        this.limit = limit;
+        this.active = 0;
+        this.waiting = [];
+    }
+
+    async acquire() {
+        if (this.active < this.limit) {
+            this.active++;
+            return;
+        }
+        await new Promise(resolve => this.waiting.push(resolve));
+    }
+
+    release() {
+        const next = this.waiting.shift();
+        if (next) {
+            // Hand the slot straight to the next waiter
+            next();
+        } else {
+            this.active--;
+        }
+    }
+
+    async run(task) {
+        await this.acquire();
+        try {
+            return await task();
+        } finally {
+            this.release();
+        }
+    }
+}
+
+/**
+ * Sliding-window rate limiter: at most `maxRequests` starts per `intervalMs`
+ */
+export class RateLimiter {
+    constructor(maxRequests, intervalMs = 60000) {
+        this.maxRequests = maxRequests;
+        this.intervalMs = intervalMs;
+        this.timestamps = [];
+    }
+
+    // Resolves once a slot is taken; rejects without taking one if `signal` aborts first
+    async wait(signal) {
+        for (;;) {
+            signal?.throwIfAborted();
+            const now = Date.now();
+            while (this.timestamps.length > 0 && now - this.timestamps[0] >= this.intervalMs) {
+                this.timestamps.shift();
+            }
+
+            if (this.timestamps.length < this.maxRequests) {
+                this.timestamps.push(now);
+                return;
+            }
+
+            await sleep(this.intervalMs - (now - this.timestamps[0]), undefined, { signal });
+        }
+    }
+}
@@ -0,0 +1,14 @@
+import https from 'https';
+import { getSettings } from '../config/index.js';
+
+const settings = getSettings();
+
+// Process-wide keep-alive agent shared by the OpenAI and Groq clients so
+// provider calls reuse TLS connections instead of handshaking per request
+export const httpAgent = new https.Agent({
+    keepAlive: true,
+    maxSockets: settings.httpMaxSockets,
+    maxFreeSockets: settings.httpMaxFreeSockets
+});
+
+export default httpAgent;
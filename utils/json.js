@@ -0,0 +1,29 @@
+// Matches a response wrapped in a markdown code fence (```json ... ```),
+// capturing the body. The closing fence is optional so truncated output
+// still parses, and the language tag is matched case-insensitively.
+// Compiled once and shared by the AI services.
+const CODE_FENCE_RE = /^\s*```(?:json)?\s*([\s\S]*?)\s*(?:```\s*)?$/i;
+
+// Parse model output as JSON, unwrapping a markdown code fence if present.
+// If that fails (e.g. prose before or after the JSON), the outermost
+// {...} span is tried before giving up with the original error.
+export function parseModelJson(text) {
+    const match = CODE_FENCE_RE.exec(text);
+    const body = match ? match[1] : text;
+    try {
+        return JSON.parse(body);
+    } catch (e) {
+        const start = body.indexOf('{');
+        const end = body.lastIndexOf('}');
+        if (start !== -1 && end > start) {
+            try {
+                return JSON.parse(body.slice(start, end + 1));
+            } catch {
+                // fall through to the original error
+            }
+        }
+        throw e;
+    }
+}
+
+export default parseModelJson;
@@ -0,0 +1,62 @@
+import { format } from 'util';
+
+// Log levels in increasing severity
+const LEVELS = { debug: 10, info: 20, warn: 30, error: 40 };
+
+// Lines are buffered and written once per event loop turn instead of one
+// synchronous stdout/stderr write per call
+const pending = { stdout: [], stderr: [] };
+let flushScheduled = false;
+let threshold = null;
+
+function minLevel() {
+    // Resolved on first use so LOG_LEVEL from .env has been loaded
+    if (threshold === null) {
+        threshold = LEVELS[(process.env.LOG_LEVEL || '').toLowerCase()] ?? LEVELS.info;
+    }
+    return threshold;
+}
+
+function flush() {
+    flushScheduled = false;
+    if (pending.stdout.length > 0) {
+        process.stdout.write(pending.stdout.splice(0).join(''));
+    }
+    if (pending.stderr.length > 0) {
+        process.stderr.write(pending.stderr.splice(0).join(''));
+    }
+}
+
+// Make sure buffered lines are written when the process exits
+process.on('exit', flush);
+
+function write(level, scope, args) {
+    // Filtered levels return before any formatting work
+    if (LEVELS[level] < minLevel()) {
+        return;
+    }
+
+    const line = `${new Date().toISOString()} ${level.toUpperCase()} [${scope}] ${format(...args)}\n`;
+    const stream = LEVELS[level] >= LEVELS.warn ? pending.stderr : pending.stdout;
+    stream.push(line);
+
+    if (!flushScheduled) {
+        flushScheduled = true;
+        setImmediate(flush);
+    }
+}
+
+/**
+ * Create a logger tagged with the given scope
+ * Error objects passed as arguments are printed with their stack trace
+ */
+export function createLogger(scope) {
+    return {
+        debug: (...args) => write('debug', scope, args),
+        info: (...args) => write('info', scope, args),
+        warn: (...args) => write('warn', scope, args),
+        error: (...args) => write('error', scope, args)
+    };
+}
+
+export default createLogger;
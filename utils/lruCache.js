@@ -0,0 +1,64 @@
+// Least-recently-used cache built on Map insertion order
+// With `ttlMs` set, entries also expire that long after they were written;
+// set() can give a single entry its own TTL
+export class LRUCache {
+    constructor({ maxSize = 1000, ttlMs = 0 } = {}) {
+        this.maxSize = maxSize;
+        this.ttlMs = ttlMs;
+        this.entries = new Map();
+    }
+
+    get size() {
+        return this.entries.size;
+    }
+
+    has(key) {
+        return this._live(key) !== undefined;
+    }
+
+    get(key) {
+        const entry = this._live(key);
+        if (entry === undefined) {
+            return undefined;
+        }
+
+        // Re-insert to mark as most recently used
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        return entry.value;
+    }
+
+    set(key, value, ttlMs = this.ttlMs) {
+        this.entries.delete(key);
+        this.entries.set(key, {
+            value,
+            expiresAt: ttlMs > 0 ? Date.now() + ttlMs : Infinity
+        });
+
+        if (this.entries.size > this.maxSize) {
+            // First key in iteration order is the least recently used
+            this.entries.delete(this.entries.keys().next().value);
+        }
+        return this;
+    }
+
+    delete(key) {
+        return this.entries.delete(key);
+    }
+
+    clear() {
+        this.entries.clear();
+    }
+
+    // Entry for `key`, dropping it first if it has expired
+    _live(key) {
+        const entry = this.entries.get(key);
+        if (entry !== undefined && entry.expiresAt <= Date.now()) {
+            this.entries.delete(key);
+            return undefined;
+        }
+        return entry;
+    }
+}
+
+export default LRUCache;
@@ -0,0 +1,93 @@
+// Semantic response cache
+// Returns a stored response when a new prompt's embedding is close enough
+// (cosine similarity >= threshold) to one seen before. Entries are grouped
+// into partitions so only prompts generated for the same context are compared.
+// Partitions are themselves evicted least-recently-used once there are more
+// than `maxPartitions`, since partition keys include user-supplied values.
+
+function normalize(vector) {
+    const normalized = Float32Array.from(vector);
+    let norm = 0;
+    for (let i = 0; i < normalized.length; i++) {
+        norm += normalized[i] * normalized[i];
+    }
+    norm = Math.sqrt(norm) || 1;
+    for (let i = 0; i < normalized.length; i++) {
+        normalized[i] /= norm;
+    }
+    return normalized;
+}
+
+function dot(a, b) {
+    let sum = 0;
+    for (let i = 0; i < a.length; i++) {
+        sum += a[i] * b[i];
+    }
+    return sum;
+}
+
+export class SemanticCache {
+    constructor({ threshold = 0.92, maxEntriesPerPartition = 1000, maxPartitions = 256 } = {}) {
+        this.threshold = threshold;
+        this.maxEntriesPerPartition = maxEntriesPerPartition;
+        this.maxPartitions = maxPartitions;
+        this.partitions = new Map();
+    }
+
+    // Entries for `partition`, marked as most recently used
+    _touch(partition) {
+        const entries = this.partitions.get(partition);
+        if (entries) {
+            this.partitions.delete(partition);
+            this.partitions.set(partition, entries);
+        }
+        return entries;
+    }
+
+    /**
+     * Return the cached response most similar to `embedding`, or null if
+     * nothing in the partition clears the similarity threshold
+     */
+    lookup(partition, embedding) {
+        const entries = this._touch(partition);
+        if (!entries) {
+            return null;
+        }
+
+        // Stored vectors are unit length, so the dot product is the cosine similarity
+        const query = normalize(embedding);
+        let best = null;
+        let bestScore = -1;
+        for (const entry of entries) {
+            const score = dot(query, entry.vector);
+            if (score > bestScore) {
+                bestScore = score;
+                best = entry;
+            }
+        }
+
+        return best && bestScore >= this.threshold ? best.response : null;
+    }
+
+    /**
+     * Store a response; the oldest entry is dropped once a partition is full
+     */
+    add(partition, embedding, response) {
+        let entries = this._touch(partition);
+        if (!entries) {
+            entries = [];
+            this.partitions.set(partition, entries);
+            if (this.partitions.size > this.maxPartitions) {
+                // First key in iteration order is the least recently used
+                this.partitions.delete(this.partitions.keys().next().value);
+            }
+        }
+
+        entries.push({ vector: normalize(embedding), response });
+        if (entries.length > this.maxEntriesPerPartition) {
+            entries.shift();
+        }
+    }
+}
+
+export default SemanticCache;